@@ -0,0 +1,184 @@
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import orjson
+from sqlalchemy import select, update, delete, insert, func, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from DB.models import Chat, ChatArchive, Message, MESSAGE_SEARCH_DROP_DDL
+from serializers import chat_messages_query, encode_messages
+
+#DB/archive.py
+# Chats with no activity for ARCHIVE_AFTER_DAYS are moved out of `messages`
+# into one compressed ChatArchive row each. Summary columns on Chat are left
+# untouched, so the sidebar does not notice; the messages ETag includes
+# archived_at. Archived messages keep their ids and are not part of the
+# full-text index until the chat is rehydrated.
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_REHYDRATE_ON_READ = os.getenv("ARCHIVE_REHYDRATE_ON_READ", "false").lower() in ("1", "true", "yes")
+COMPRESSION_LEVEL = 9
+# Archived ids are deleted/looked up in chunks to stay under bound-parameter limits
+ID_BATCH_SIZE = 1000
+
+
+async def archive_chat(db: AsyncSession, chat_id: int, cutoff: Optional[datetime] = None) -> int:
+    """Moves the chat's messages into a compressed archive row. The caller commits.
+
+    The chat is claimed first with a conditional UPDATE, so a chat that got a
+    new message after `cutoff` (or is already archived) is left alone, and
+    only the rows that went into the payload are deleted. A message posted
+    concurrently stays in `messages` and its sender rehydrates the chat.
+    """
+    claim = update(Chat).where(Chat.id == chat_id, Chat.archived_at.is_(None))
+    if cutoff is not None:
+        claim = claim.where(Chat.last_message_at < cutoff)
+    result = await db.execute(
+        claim.values(archived_at=datetime.now(timezone.utc)).execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return 0
+
+    rows = (await db.execute(chat_messages_query(chat_id))).all()
+    if not rows:
+        await db.execute(update(Chat).where(Chat.id == chat_id).values(archived_at=None))
+        return 0
+
+    db.add(ChatArchive(
+        chat_id=chat_id,
+        message_count=len(rows),
+        payload=zlib.compress(encode_messages(rows), COMPRESSION_LEVEL),
+    ))
+    archived_ids = [row.id for row in rows]
+    for start in range(0, len(archived_ids), ID_BATCH_SIZE):
+        await db.execute(
+            delete(Message)
+            .where(Message.id.in_(archived_ids[start:start + ID_BATCH_SIZE]))
+            .execution_options(synchronize_session=False)
+        )
+    return len(rows)
+
+
+async def archive_inactive_chats(
+    db: AsyncSession,
+    days: int = ARCHIVE_AFTER_DAYS,
+    limit: Optional[int] = None,
+) -> tuple[int, int]:
+    """Archives chats idle for `days`, one transaction per chat.
+    Returns (chats archived, messages moved)."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    stmt = (
+        select(Chat.id)
+        .where(Chat.archived_at.is_(None), Chat.message_count > 0, Chat.last_message_at < cutoff)
+        .order_by(Chat.last_message_at)
+    )
+    if limit:
+        stmt = stmt.limit(limit)
+    chat_ids = (await db.scalars(stmt)).all()
+
+    chats = messages = 0
+    for chat_id in chat_ids:
+        moved = await archive_chat(db, chat_id, cutoff)
+        await db.commit()
+        if moved:
+            chats += 1
+            messages += moved
+    return chats, messages
+
+
+async def load_archived_payload(db: AsyncSession, chat_id: int) -> Optional[bytes]:
+    """The archived messages as a JSON array, ready to be sent as is"""
+    payload = await db.scalar(select(ChatArchive.payload).where(ChatArchive.chat_id == chat_id))
+    return zlib.decompress(payload) if payload is not None else None
+
+
+async def load_archived_messages(db: AsyncSession, chat_id: int) -> List[dict]:
+    payload = await load_archived_payload(db, chat_id)
+    messages = orjson.loads(payload) if payload else []
+    for message in messages:
+        message["timestamp"] = datetime.fromisoformat(message["timestamp"])
+    return messages
+
+
+async def rehydrate_chat(db: AsyncSession, chat_id: int) -> int:
+    """Moves an archived chat back into `messages`, keeping the message ids.
+    The caller commits. Does nothing if the chat is no longer archived."""
+    result = await db.execute(
+        update(Chat)
+        .where(Chat.id == chat_id, Chat.archived_at.is_not(None))
+        .values(archived_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return 0
+    messages = await load_archived_messages(db, chat_id)
+    if messages:
+        # SQLite may have handed an archived id to a newer message; those
+        # rows get a fresh id instead of failing the whole rehydration
+        archived_ids = [message["id"] for message in messages]
+        taken = set()
+        for start in range(0, len(archived_ids), ID_BATCH_SIZE):
+            taken.update((await db.scalars(
+                select(Message.id).where(Message.id.in_(archived_ids[start:start + ID_BATCH_SIZE]))
+            )).all())
+        kept = [message for message in messages if message["id"] not in taken]
+        renumbered = [
+            {key: value for key, value in message.items() if key != "id"}
+            for message in messages if message["id"] in taken
+        ]
+        # Kept ids first, so the renumbered rows are allocated above them
+        for batch in (kept, renumbered):
+            if batch:
+                await db.execute(insert(Message), batch)
+    await db.execute(delete(ChatArchive).where(ChatArchive.chat_id == chat_id))
+    return len(messages)
+
+
+async def load_chat_messages(db: AsyncSession, chat: Chat) -> list:
+    """Messages of a chat for rendering, whether it is hot or archived"""
+    if chat.archived_at is not None:
+        if not ARCHIVE_REHYDRATE_ON_READ:
+            return await load_archived_messages(db, chat.id)
+        await rehydrate_chat(db, chat.id)
+        await db.commit()
+        chat.archived_at = None
+    return (await db.execute(chat_messages_query(chat.id))).all()
+
+
+def migrate_message_ids(conn) -> bool:
+    """Rebuilds an existing SQLite `messages` table with AUTOINCREMENT, so ids
+    freed by archiving are never reused. Run with `conn.run_sync` before
+    archiving. Returns False if there was nothing to do."""
+    if conn.dialect.name != "sqlite":
+        return False
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'messages'")).scalar()
+    if ddl is None or "AUTOINCREMENT" in ddl.upper():
+        return False
+
+    # Highest id ever handed out, including messages that only live in archives
+    highest = conn.execute(select(func.max(Message.id))).scalar() or 0
+    if inspect(conn).has_table(ChatArchive.__tablename__):
+        for payload in conn.execute(select(ChatArchive.payload)).scalars():
+            highest = max([highest, *(message["id"] for message in orjson.loads(zlib.decompress(payload)))])
+
+    # Indexes, triggers and the search view would follow the renamed table; drop
+    # them so the model recreates them
+    for statement in MESSAGE_SEARCH_DROP_DDL["sqlite"]:
+        conn.execute(text(statement))
+    for kind, name in conn.execute(text(
+        "SELECT type, name FROM sqlite_master "
+        "WHERE tbl_name = 'messages' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+    )).all():
+        conn.execute(text(f"DROP {kind.upper()} {name}"))
+    conn.execute(text("ALTER TABLE messages RENAME TO messages_old"))
+    Message.__table__.create(conn)
+
+    columns = ", ".join(column.name for column in Message.__table__.columns)
+    conn.execute(text(f"INSERT INTO messages ({columns}) SELECT {columns} FROM messages_old"))
+    conn.execute(text("DROP TABLE messages_old"))
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'messages'"))
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('messages', :seq)"), {"seq": highest})
+    # The copy went through the insert trigger again; reindex from the table
+    conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+    return True
@@ -0,0 +1,134 @@
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+from sqlalchemy import select, update, delete, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from DB.models import Chat, Message
+
+#DB/chats.py
+# Every insert/delete of messages goes through here so the summary columns
+# on Chat stay in sync within the same transaction.
+PREVIEW_LENGTH = 120
+
+
+def make_preview(content: str) -> str:
+    return content[:PREVIEW_LENGTH]
+
+
+def _latest_message(column):
+    return (
+        select(column)
+        .where(Message.chat_id == Chat.id)
+        .order_by(Message.timestamp.desc(), Message.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+async def add_message(db: AsyncSession, chat_id: int, sender: str, content: str) -> Message:
+    """Adds a message and bumps the chat summary. The caller commits."""
+    now = datetime.now(timezone.utc)
+    message = Message(chat_id=chat_id, sender=sender, content=content, timestamp=now)
+    db.add(message)
+    await db.execute(
+        update(Chat)
+        .where(Chat.id == chat_id)
+        .values(
+            message_count=Chat.message_count + 1,
+            last_message_at=now,
+            last_message_preview=make_preview(content),
+        )
+    )
+    return message
+
+
+async def refresh_chat_summaries(db: AsyncSession, chat_ids: Optional[Iterable[int]] = None):
+    """Recomputes the summary columns from `messages`, for all chats if no ids are given"""
+    stmt = update(Chat).values(
+        message_count=select(func.count(Message.id)).where(Message.chat_id == Chat.id).scalar_subquery(),
+        last_message_at=func.coalesce(_latest_message(Message.timestamp), Chat.created_at),
+        last_message_preview=_latest_message(func.substr(Message.content, 1, PREVIEW_LENGTH)),
+    )
+    if chat_ids is not None:
+        chat_ids = list(chat_ids)
+        if not chat_ids:
+            return
+        stmt = stmt.where(Chat.id.in_(chat_ids))
+    await db.execute(stmt.execution_options(synchronize_session=False))
+
+
+async def after_messages_deleted(db: AsyncSession, chat_id: int, deleted: int):
+    """Updates the summary of a chat after `deleted` of its messages were removed"""
+    if deleted <= 0:
+        return
+    await db.execute(
+        update(Chat)
+        .where(Chat.id == chat_id)
+        .values(
+            message_count=Chat.message_count - deleted,
+            last_message_at=func.coalesce(_latest_message(Message.timestamp), Chat.created_at),
+            last_message_preview=_latest_message(func.substr(Message.content, 1, PREVIEW_LENGTH)),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def list_user_chats(db: AsyncSession, user_id: int) -> List[Chat]:
+    """Sidebar listing, most recently active first (served by ix_chats_user_last_message_at)"""
+    result = await db.execute(
+        select(Chat)
+        .where(Chat.user_id == user_id)
+        .order_by(Chat.last_message_at.desc(), Chat.id.desc())
+    )
+    return result.scalars().all()
+
+
+def _owned_chats(user_id: int, chat_ids: Optional[Iterable[int]] = None):
+    stmt = select(Chat.id).where(Chat.user_id == user_id)
+    if chat_ids is not None:
+        stmt = stmt.where(Chat.id.in_(list(chat_ids)))
+    return stmt
+
+
+async def delete_chats(db: AsyncSession, user_id: int, chat_ids: Optional[Iterable[int]] = None) -> List[int]:
+    """Deletes the user's chats (all of them if no ids are given) with set-based
+    DELETEs and returns the ids that were removed. The caller commits."""
+    # ON DELETE CASCADE removes the messages where the schema has it; the explicit
+    # DELETE keeps databases created before the constraint consistent too
+    await db.execute(
+        delete(Message)
+        .where(Message.chat_id.in_(_owned_chats(user_id, chat_ids)))
+        .execution_options(synchronize_session=False)
+    )
+    stmt = delete(Chat).where(Chat.user_id == user_id)
+    if chat_ids is not None:
+        stmt = stmt.where(Chat.id.in_(list(chat_ids)))
+    result = await db.execute(stmt.returning(Chat.id).execution_options(synchronize_session=False))
+    return list(result.scalars())
+
+
+async def delete_messages(db: AsyncSession, user_id: int, sender: str, message_ids: Iterable[int]) -> int:
+    """Deletes the given messages if they belong to the user's chats and were sent
+    by the user or the AI. Returns the number of deleted rows. The caller commits."""
+    message_ids = list(message_ids)
+    if not message_ids:
+        return 0
+
+    # An archived chat has no message rows, and the ids shown on its page must not
+    # reach rows of another chat; only live chats can be edited
+    condition = and_(
+        Message.id.in_(message_ids),
+        Message.chat_id.in_(_owned_chats(user_id).where(Chat.archived_at.is_(None))),
+        Message.sender.in_([sender, "AI"]),
+    )
+    per_chat = (await db.execute(
+        select(Message.chat_id, func.count(Message.id)).where(condition).group_by(Message.chat_id)
+    )).all()
+    if not per_chat:
+        return 0
+
+    await db.execute(delete(Message).where(condition).execution_options(synchronize_session=False))
+    for chat_id, deleted in per_chat:
+        await after_messages_deleted(db, chat_id, deleted)
+    return sum(deleted for _, deleted in per_chat)
@@ -1,4 +1,6 @@
 import os
+from sqlalchemy import event, inspect, text, Table
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
@@ -8,10 +10,19 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./db/test.db")
 API_KEY = os.getenv("API_KEY", "123")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
 SECRET_KEY = os.getenv("ADMIN_TOKEN", 
                         "eyJzdWIiOiIxMjM0NTY3ODkwIiwibmFtZSI6IkpvaG4gRG9lIiwiYWRtaW4iOnRydWUsImlhdCI6MTUxNjIzOTAyMn0")
 engine = create_async_engine(DATABASE_URL, echo=True)
 
+if engine.dialect.name == "sqlite":
+    # SQLite ignores foreign keys (and ON DELETE CASCADE) unless asked per connection
+    @event.listens_for(engine.sync_engine, "connect")
+    def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
 
 AsyncSessionLocal = sessionmaker(
     bind=engine, 
@@ -23,6 +34,18 @@ AsyncSessionLocal = sessionmaker(
 
 Base = declarative_base()
 
+def add_missing_columns(conn, table: Table):
+    """Brings an existing table up to date with its model: adds missing
+    columns and indexes. Run with `await conn.run_sync(add_missing_columns, table)`."""
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in existing:
+            column_ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+            print(f"Added column {table.name}.{column.name}")
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         try:
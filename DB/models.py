@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Text, LargeBinary, Index, DDL, event
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from DB.database import Base
@@ -20,21 +20,98 @@ class Chat(Base):
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
+    # Denormalized summary of the messages, maintained by DB/chats.py
+    last_message_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_preview = Column(String)
+    # Set while the messages live in ChatArchive instead of `messages`
+    archived_at = Column(DateTime)
+    messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan", passive_deletes=True)
     user = relationship("User", back_populates="chats")
 
+    __table_args__ = (
+        Index("ix_chats_user_last_message_at", "user_id", "last_message_at"),
+    )
+
 
 class Message(Base):
     __tablename__ = "messages"
 
     id = Column(Integer, primary_key=True)
-    chat_id = Column(Integer, ForeignKey("chats.id"), nullable=False)
+    chat_id = Column(Integer, ForeignKey("chats.id", ondelete="CASCADE"), nullable=False)
     sender = Column(String, nullable=False)
     content = Column(Text, nullable=False)
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     
     chat = relationship("Chat", back_populates="messages")
 
+    __table_args__ = (
+        Index("ix_messages_chat_timestamp", "chat_id", "timestamp"),
+        # Archived chats keep their message ids, so SQLite must never hand them out
+        # again (see migrate_message_ids in DB/archive.py for existing databases)
+        {"sqlite_autoincrement": True},
+    )
+
+
+class ChatArchive(Base):
+    __tablename__ = "chat_archives"
+
+    chat_id = Column(Integer, ForeignKey("chats.id", ondelete="CASCADE"), primary_key=True)
+    archived_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    message_count = Column(Integer, nullable=False)
+    # zlib-compressed JSON array of messages, same shape as MessageResponse
+    payload = Column(LargeBinary, nullable=False)
+
+
+# Full-text index over messages.content, kept in sync by triggers (see DB/search.py).
+# On SQLite every message is also indexed with an owner token "u<user id>", so a
+# search is limited to one user inside MATCH, before anything is ranked.
+MESSAGE_OWNER = "(SELECT 'u' || user_id FROM chats WHERE id = {}.chat_id)"
+MESSAGE_SEARCH_DDL = {
+    "sqlite": [
+        "CREATE VIEW IF NOT EXISTS messages_fts_source AS "
+        "SELECT m.id AS id, m.content AS content, 'u' || c.user_id AS owner "
+        "FROM messages m JOIN chats c ON c.id = m.chat_id",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, owner, "
+        "content='messages_fts_source', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN "
+        f"INSERT INTO messages_fts(rowid, content, owner) VALUES (new.id, new.content, {MESSAGE_OWNER.format('new')}); END",
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN "
+        "INSERT INTO messages_fts(messages_fts, rowid, content, owner) "
+        f"VALUES ('delete', old.id, old.content, {MESSAGE_OWNER.format('old')}); END",
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content, chat_id ON messages BEGIN "
+        "INSERT INTO messages_fts(messages_fts, rowid, content, owner) "
+        f"VALUES ('delete', old.id, old.content, {MESSAGE_OWNER.format('old')}); "
+        f"INSERT INTO messages_fts(rowid, content, owner) VALUES (new.id, new.content, {MESSAGE_OWNER.format('new')}); END",
+        # The delete trigger needs the chat to find the owner, which an ON DELETE
+        # CASCADE would already have removed
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_chat_delete BEFORE DELETE ON chats BEGIN "
+        "DELETE FROM messages WHERE chat_id = old.id; END",
+    ],
+    "postgresql": [
+        "CREATE INDEX IF NOT EXISTS ix_messages_content_fts ON messages "
+        "USING gin (to_tsvector('simple', content))",
+    ],
+}
+
+MESSAGE_SEARCH_DROP_DDL = {
+    "sqlite": [
+        "DROP TRIGGER IF EXISTS messages_fts_chat_delete",
+        "DROP TRIGGER IF EXISTS messages_fts_insert",
+        "DROP TRIGGER IF EXISTS messages_fts_delete",
+        "DROP TRIGGER IF EXISTS messages_fts_update",
+        "DROP TABLE IF EXISTS messages_fts",
+        "DROP VIEW IF EXISTS messages_fts_source",
+    ],
+}
+
+for dialect, statements in MESSAGE_SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(Message.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+for dialect, statements in MESSAGE_SEARCH_DROP_DDL.items():
+    for statement in statements:
+        event.listen(Message.__table__, "before_drop", DDL(statement).execute_if(dialect=dialect))
+
 
 class Performance(Base):
     __tablename__ = "performances"
@@ -44,8 +121,16 @@ class Performance(Base):
     title = Column(String, nullable=False)
     author = Column(String)
     actors = Column(String)
+    # Materialized count of bookings, maintained by book_ticket/cancel_booking
+    # and repaired by DB/occupancy.py
+    seats_sold = Column(Integer, nullable=False, default=0, server_default="0")
     bookings = relationship("Booking", back_populates="performance")
 
+    __table_args__ = (
+        # Schedule imports upsert by this key
+        Index("ix_performances_date_title", "date", "title", unique=True),
+    )
+
 class Booking(Base):
     __tablename__ = "bookings"
 
@@ -54,4 +139,9 @@ class Booking(Base):
     performance_id = Column(Integer, ForeignKey("performances.id"))
     seat_code = Column(String, nullable=False)
     user = relationship("User", back_populates="bookings")
-    performance = relationship("Performance", back_populates="bookings")
\ No newline at end of file
+    performance = relationship("Performance", back_populates="bookings")
+
+    __table_args__ = (
+        # Last line of defence against double booking; seat holds are per process
+        Index("ix_bookings_performance_seat", "performance_id", "seat_code", unique=True),
+    )
\ No newline at end of file
@@ -0,0 +1,24 @@
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from DB.models import Booking, Performance
+
+#DB/occupancy.py
+async def reconcile_occupancy(db: AsyncSession, performance_ids: Optional[Iterable[int]] = None) -> int:
+    """Recomputes Performance.seats_sold from bookings where it has drifted.
+    Returns the number of corrected performances. The caller commits."""
+    actual = (
+        select(func.count(Booking.id))
+        .where(Booking.performance_id == Performance.id)
+        .scalar_subquery()
+    )
+    stmt = update(Performance).where(Performance.seats_sold != actual).values(seats_sold=actual)
+    if performance_ids is not None:
+        performance_ids = list(performance_ids)
+        if not performance_ids:
+            return 0
+        stmt = stmt.where(Performance.id.in_(performance_ids))
+    result = await db.execute(stmt.execution_options(synchronize_session=False))
+    return result.rowcount
@@ -0,0 +1,143 @@
+import base64
+import json
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import DateTime, Float, Integer, String, bindparam, literal, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection
+
+from DB.models import Chat, Message, MESSAGE_SEARCH_DDL, MESSAGE_SEARCH_DROP_DDL
+
+#DB/search.py
+# Results are ordered by (score ASC, id DESC): lower score is a better match,
+# ties go to the newest message. The cursor is the (score, id) of the last hit.
+# On SQLite the query is ANDed with the user's owner token, so other users'
+# messages are never ranked or snippeted.
+SNIPPET_START = "["
+SNIPPET_END = "]"
+SNIPPET_TOKENS = 12
+RESULT_COLUMNS = dict(id=Integer, chat_id=Integer, sender=String, timestamp=DateTime, snippet=String, score=Float)
+
+SQLITE_SEARCH = text(f"""
+    SELECT id, chat_id, sender, timestamp, snippet, score FROM (
+        SELECT m.id AS id, m.chat_id AS chat_id, m.sender AS sender, m.timestamp AS timestamp,
+               snippet(messages_fts, 0, '{SNIPPET_START}', '{SNIPPET_END}', '…', {SNIPPET_TOKENS}) AS snippet,
+               bm25(messages_fts, 1.0, 0.0) AS score
+        FROM messages_fts
+        JOIN messages m ON m.id = messages_fts.rowid
+        JOIN chats c ON c.id = m.chat_id
+        WHERE messages_fts MATCH :query AND c.user_id = :user_id
+    )
+    WHERE :after_score IS NULL OR score > :after_score OR (score = :after_score AND id < :after_id)
+    ORDER BY score, id DESC
+    LIMIT :limit
+""").bindparams(
+    bindparam("after_score", type_=Float), bindparam("after_id", type_=Integer)
+).columns(**RESULT_COLUMNS)
+
+POSTGRES_SEARCH = text(f"""
+    SELECT id, chat_id, sender, timestamp, snippet, score FROM (
+        SELECT m.id AS id, m.chat_id AS chat_id, m.sender AS sender, m.timestamp AS timestamp,
+               ts_headline('simple', m.content, q,
+                           'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxWords={SNIPPET_TOKENS * 2}, MinWords={SNIPPET_TOKENS // 2}') AS snippet,
+               -ts_rank(to_tsvector('simple', m.content), q) AS score
+        FROM messages m
+        JOIN chats c ON c.id = m.chat_id,
+             plainto_tsquery('simple', :query) q
+        WHERE c.user_id = :user_id AND to_tsvector('simple', m.content) @@ q
+    ) hits
+    WHERE :after_score IS NULL OR score > :after_score OR (score = :after_score AND id < :after_id)
+    ORDER BY score, id DESC
+    LIMIT :limit
+""").bindparams(
+    bindparam("after_score", type_=Float), bindparam("after_id", type_=Integer)
+).columns(**RESULT_COLUMNS)
+
+
+def search_terms(query: str) -> List[str]:
+    return re.findall(r"\w+", query)
+
+
+def to_fts5_query(terms: List[str], user_id: int) -> str:
+    # Quote every term so user input can never be parsed as FTS5 syntax;
+    # the last term is a prefix match for search-as-you-type
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return f"owner:u{user_id} AND ({' '.join(quoted)})"
+
+
+def encode_cursor(score: float, message_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([score, message_id]).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[Optional[float], Optional[int]]:
+    if not cursor:
+        return None, None
+    try:
+        score, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), int(message_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+async def search_messages(
+    db: AsyncSession,
+    user_id: int,
+    query: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[list, Optional[str]]:
+    """Ranked search over the user's messages. Returns (rows, next_cursor)."""
+    terms = search_terms(query)
+    if not terms:
+        return [], None
+    after_score, after_id = decode_cursor(cursor)
+    params = {"user_id": user_id, "after_score": after_score, "after_id": after_id, "limit": limit + 1}
+
+    dialect = db.bind.dialect.name
+    if dialect == "sqlite":
+        rows = (await db.execute(SQLITE_SEARCH, {**params, "query": to_fts5_query(terms, user_id)})).all()
+    elif dialect == "postgresql":
+        rows = (await db.execute(POSTGRES_SEARCH, {**params, "query": " ".join(terms)})).all()
+    else:
+        rows = await _search_like(db, terms, params)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].score, rows[-1].id)
+    return rows, next_cursor
+
+
+async def _search_like(db: AsyncSession, terms: List[str], params: dict) -> list:
+    """Unranked fallback for backends without a full-text index: newest first"""
+    stmt = (
+        select(
+            Message.id,
+            Message.chat_id,
+            Message.sender,
+            Message.timestamp,
+            Message.content.label("snippet"),
+            literal(0.0).label("score"),
+        )
+        .join(Chat, Chat.id == Message.chat_id)
+        .where(Chat.user_id == params["user_id"])
+        .order_by(Message.id.desc())
+        .limit(params["limit"])
+    )
+    for term in terms:
+        stmt = stmt.where(Message.content.ilike(f"%{term}%"))
+    if params["after_id"] is not None:
+        stmt = stmt.where(Message.id < params["after_id"])
+    return (await db.execute(stmt)).all()
+
+
+async def rebuild_search_index(conn: AsyncConnection):
+    """Creates the full-text index, replacing an older SQLite index, and
+    reindexes existing messages"""
+    for statement in MESSAGE_SEARCH_DROP_DDL.get(conn.dialect.name, []):
+        await conn.execute(text(statement))
+    for statement in MESSAGE_SEARCH_DDL.get(conn.dialect.name, []):
+        await conn.execute(text(statement))
+    if conn.dialect.name == "sqlite":
+        await conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
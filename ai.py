@@ -4,22 +4,39 @@ from datetime import date, datetime
 from typing import Optional
 
 from openai import AsyncOpenAI
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, and_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from DB.database import API_KEY
+from DB.database import API_KEY, OPENAI_BASE_URL
 from DB.models import Performance, Booking
+from llm import LLMScheduler
+from routing import ModelRouter
+from holds import seat_holds, HoldLimitError
 
 # ai.py
-client = AsyncOpenAI(api_key=API_KEY)
+# Retries and timeouts are handled by the scheduler, not by the SDK
+client = AsyncOpenAI(api_key=API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
+llm = LLMScheduler(client)
+# Per-phase model choice and escalation, see routing.py
+router = ModelRouter(llm)
+
+# Hall layout, see is_valid_seat_code: rows 1-20, seats A-Q
+SEAT_ROWS = 20
+SEATS_PER_ROW = 17
+TOTAL_SEATS = SEAT_ROWS * SEATS_PER_ROW
 
 async def list_performances(
     db: AsyncSession,
     start_date: Optional[date] = None,
-    end_date: Optional[date] = None
+    end_date: Optional[date] = None,
+    available_only: bool = False
 ) -> str:
     query = select(Performance)
 
+    if available_only:
+        query = query.where(Performance.seats_sold < TOTAL_SEATS)
+
     if start_date and end_date:
         query = query.where(Performance.date.between(start_date, end_date))
     elif start_date:
@@ -31,10 +48,18 @@ async def list_performances(
     result = await db.execute(query)
     performances = result.scalars().all()
 
-    if not performances:
+    lines = []
+    for p in performances:
+        held = seat_holds.held_count(p.id)
+        free = max(TOTAL_SEATS - p.seats_sold - held, 0)
+        # Holds live in memory, so shows whose last seats are held are dropped here
+        if available_only and not free:
+            continue
+        lines.append(f"{p.id}. {p.title} - {p.date} (sold: {p.seats_sold}, held: {held}, free: {free})")
+
+    if not lines:
         return "No performances found for the specified period."
-    
-    return "\n".join(f"{p.id}. {p.title} - {p.date}" for p in performances)
+    return "\n".join(lines)
 
 async def my_list_performances( 
     db: AsyncSession,
@@ -69,8 +94,14 @@ async def my_list_performances(
 async def check_book_ticket(
     db: AsyncSession,
     performance_id: int,
-    seat_code: str
+    seat_code: str,
+    user_id: Optional[int] = None
 ) -> tuple[bool, str]:
+    """Seats held by anyone other than `user_id` count as taken"""
+    seat_code = normalize_seat_code(seat_code)
+    holder = seat_holds.holder(performance_id, seat_code)
+    if holder is not None and holder != user_id:
+        return False, f"Seat {seat_code} is temporarily held by another customer."
     result = await db.scalar(
         select(Booking).where(
             and_(
@@ -86,6 +117,50 @@ async def check_book_ticket(
 def is_valid_seat_code(seat_code: str) -> bool:
     return bool(re.fullmatch(r"(1[0-9]|20|[1-9])-[A-Q]", seat_code.upper()))
 
+def normalize_seat_code(seat_code: str) -> str:
+    return seat_code.strip().upper()
+
+async def hold_seats(
+    db: AsyncSession,
+    performance_id: int,
+    seat_codes: list[str],
+    user_id: int,
+) -> str:
+    """Reserves seats for the user for SEAT_HOLD_SECONDS, all or nothing.
+    Seats added later expire with the user's first hold on the performance."""
+    seat_codes = [normalize_seat_code(seat) for seat in seat_codes]
+    if not seat_codes:
+        return "No seats given."
+    invalid = [seat for seat in seat_codes if not is_valid_seat_code(seat)]
+    if invalid:
+        return f"Invalid seat format: {', '.join(invalid)}. Use format 3-B or 17-H."
+    if not await db.get(Performance, performance_id):
+        return f"Performance {performance_id} not found."
+
+    booked = (await db.scalars(
+        select(Booking.seat_code).where(
+            Booking.performance_id == performance_id,
+            Booking.seat_code.in_(seat_codes)
+        )
+    )).all()
+    if booked:
+        return f"Seats already taken: {', '.join(booked)}. Nothing was held."
+
+    try:
+        conflicts, expires_at = seat_holds.hold(performance_id, seat_codes, user_id)
+    except HoldLimitError as e:
+        return (
+            f"At most {e.limit} seats can be held per performance and you already hold {e.held}. "
+            f"Nothing was held; book the seats you already hold first."
+        )
+    if conflicts:
+        return f"Seats temporarily held by another customer: {', '.join(conflicts)}. Nothing was held."
+    until = datetime.fromtimestamp(expires_at).strftime("%H:%M")
+    return (
+        f"Seats {', '.join(seat_codes)} are held for you until {until}. "
+        f"Call book_ticket for each seat to confirm."
+    )
+
 async def book_ticket(
     db: AsyncSession,
     performance_id: int,
@@ -94,7 +169,10 @@ async def book_ticket(
 ) -> str:
     if not is_valid_seat_code(seat_code):
         return f"Invalid seat format: {seat_code}. Use format 3-B or 17-H." 
-    is_free, message = await check_book_ticket(db, performance_id, seat_code)
+    seat_code = normalize_seat_code(seat_code)
+    if not await db.get(Performance, performance_id):
+        return f"Performance {performance_id} not found."
+    is_free, message = await check_book_ticket(db, performance_id, seat_code, user_id)
     if not is_free:
         return message
 
@@ -104,7 +182,19 @@ async def book_ticket(
         user_id=user_id
     )
     db.add(new_ticket)
-    await db.commit()
+    await db.execute(
+        update(Performance)
+        .where(Performance.id == performance_id)
+        .values(seats_sold=Performance.seats_sold + 1)
+    )
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Booked concurrently by another request or process
+        await db.rollback()
+        return f"Ticket for seat {seat_code} is already taken."
+    # A confirmed hold becomes the booking
+    seat_holds.release(performance_id, seat_code, user_id)
     return f"Ticket for seat {seat_code} successfully booked." 
 
 async def cancel_booking(
@@ -113,6 +203,7 @@ async def cancel_booking(
     seat_code: str,
     user_id: int,
 ) -> str:
+    seat_code = normalize_seat_code(seat_code)
     stmt = select(Booking).where(
         and_(
             Booking.performance_id == performance_id,
@@ -127,6 +218,11 @@ async def cancel_booking(
         return f"Booking for seat {seat_code} not found."
 
     await db.delete(booking)
+    await db.execute(
+        update(Performance)
+        .where(Performance.id == performance_id)
+        .values(seats_sold=Performance.seats_sold - 1)
+    )
     await db.commit()
     return f"Booking for seat {seat_code} successfully cancelled."
 
@@ -138,24 +234,50 @@ TOOLS = {
             "type": "function",
             "function": { 
                 "name": "list_performances",
-                "description": "Get a list of theater performances by date",
+                "description": "Get a list of theater performances by date with sold and free seat counts",
                 "parameters": {
                     "type": "object",
                     "properties": {
                         "start_date": {"type": "string", "format": "date"},
-                        "end_date": {"type": "string", "format": "date"}
+                        "end_date": {"type": "string", "format": "date"},
+                        "available_only": {
+                            "type": "boolean",
+                            "description": "Only performances that still have free seats"
+                        }
                     }
                 }
             }
         }
     },
+    "hold_seats": {
+        "function": hold_seats,
+        "config": {
+            "type": "function",
+            "function": {
+                "name": "hold_seats",
+                "description": "Temporarily hold seats for the user for a few minutes while they confirm the booking",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "performance_id": {"type": "integer"},
+                        "seat_codes": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Seat codes in XX-Y format, e.g., [\"3-B\", \"3-C\"]"
+                        }
+                    },
+                    "required": ["performance_id", "seat_codes"]
+                }
+            }
+        }
+    },
     "book_ticket": {
         "function": book_ticket,
         "config": {
             "type": "function",  
             "function": { 
                 "name": "book_ticket",
-                "description": "Book a ticket for a performance", 
+                "description": "Book a ticket for a performance. Confirms the user's hold on the seat, if any", 
                 "parameters": {
                     "type": "object",
                     "properties": {
@@ -231,12 +353,14 @@ async def execute_tool(tool_name: str, db: AsyncSession, **kwargs):
 
 
 async def handle_tool_calls(tool_calls, openai_messages, db, current_user):
+    # Read once: a failed booking rolls back the session and expires current_user
+    user_id = current_user.id
     for tool_call in tool_calls:
         function_name = tool_call.function.name
         function_args = json.loads(tool_call.function.arguments)
         
-        if function_name in ["book_ticket", "my_list_performances","cancel_booking"]:
-            function_args["user_id"] = current_user.id
+        if function_name in ["book_ticket", "hold_seats", "my_list_performances", "cancel_booking"]:
+            function_args["user_id"] = user_id
 
         result = await execute_tool(function_name, db=db, **function_args)
         
@@ -258,5 +382,8 @@ def get_system_prompt():
         f"viewing performances, booking, viewing, and canceling bookings.\n\n"
         f"Seat format: XX-Y, XX ∈ [1..20], Y ∈ [A..Q]. Examples: 3-B, 17-H. "
         f"Do not allow booking of already taken seats or non-existent codes.\n"
+        f"When the user picks seats, hold them with hold_seats first and ask them to confirm; "
+        f"book with book_ticket only after they confirm. Held seats are released automatically "
+        f"after a few minutes.\n"
         f"Save information to the database for further interaction.\n"
     )
\ No newline at end of file
@@ -0,0 +1,135 @@
+import csv
+import io
+from typing import AsyncIterator, Optional, Sequence
+
+import orjson
+from sqlalchemy import select, tuple_
+from fastapi.responses import StreamingResponse
+
+from DB.database import AsyncSessionLocal
+from DB.models import Booking, Chat, ChatArchive, Message, Performance
+from DB.archive import load_archived_messages
+
+# exports.py
+EXPORT_CHUNK_SIZE = 1000
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+MESSAGE_COLUMNS = ("chat_id", "message_id", "sender", "timestamp", "content")
+BOOKING_COLUMNS = ("booking_id", "performance_id", "date", "title", "author", "seat_code")
+# Columns of each query's ORDER BY, used to resume after the last exported row
+MESSAGE_KEYSET = ("chat_id", "timestamp", "message_id")
+BOOKING_KEYSET = ("date", "booking_id")
+
+
+def user_messages_query(user_id: int, chat_id: Optional[int] = None):
+    stmt = (
+        select(
+            Message.chat_id,
+            Message.id.label("message_id"),
+            Message.sender,
+            Message.timestamp,
+            Message.content,
+        )
+        .join(Chat, Chat.id == Message.chat_id)
+        .where(Chat.user_id == user_id)
+        .order_by(Message.chat_id, Message.timestamp, Message.id)
+    )
+    if chat_id is not None:
+        stmt = stmt.where(Message.chat_id == chat_id)
+    return stmt
+
+
+def user_bookings_query(user_id: int):
+    return (
+        select(
+            Booking.id.label("booking_id"),
+            Booking.performance_id,
+            Performance.date,
+            Performance.title,
+            Performance.author,
+            Booking.seat_code,
+        )
+        .join(Performance, Performance.id == Booking.performance_id)
+        .where(Booking.user_id == user_id)
+        .order_by(Performance.date, Booking.id)
+    )
+
+
+def encode_ndjson(rows: Sequence, columns: Sequence[str]) -> bytes:
+    return b"".join(orjson.dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def encode_csv(rows: Sequence, columns: Sequence[str], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows(
+        [value.isoformat() if hasattr(value, "isoformat") else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+def encode_rows(rows: Sequence, columns: Sequence[str], fmt: str) -> bytes:
+    return encode_csv(rows, columns) if fmt == "csv" else encode_ndjson(rows, columns)
+
+
+async def stream_rows(
+    stmt, columns: Sequence[str], fmt: str, keyset: Sequence[str], header: bool = True
+) -> AsyncIterator[bytes]:
+    """Streams the query in pages of EXPORT_CHUNK_SIZE rows, so memory stays
+    constant regardless of the result size.
+
+    Each page is a separate keyset query (`WHERE (keyset) > (last row) LIMIT n`)
+    in its own short session, so no read transaction stays open while a slow
+    client downloads; on SQLite that would block writers. `keyset` names the
+    selected columns the query is ordered by.
+    """
+    if fmt == "csv" and header:
+        yield encode_csv([], columns, header=True)
+
+    key = tuple_(*(stmt.selected_columns[name] for name in keyset))
+    last = None
+    while True:
+        page = stmt if last is None else stmt.where(key > tuple_(*last))
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(page.limit(EXPORT_CHUNK_SIZE))).all()
+        if rows:
+            yield encode_rows(rows, columns, fmt)
+        if len(rows) < EXPORT_CHUNK_SIZE:
+            return
+        last = [rows[-1]._mapping[name] for name in keyset]
+
+
+async def stream_messages(user_id: int, fmt: str, chat_id: Optional[int] = None) -> AsyncIterator[bytes]:
+    async for chunk in stream_rows(user_messages_query(user_id, chat_id), MESSAGE_COLUMNS, fmt, MESSAGE_KEYSET):
+        yield chunk
+
+    # Archived chats are not in `messages`; they are exported one chat at a time
+    stmt = (
+        select(ChatArchive.chat_id)
+        .join(Chat, Chat.id == ChatArchive.chat_id)
+        .where(Chat.user_id == user_id)
+        .order_by(ChatArchive.chat_id)
+    )
+    if chat_id is not None:
+        stmt = stmt.where(ChatArchive.chat_id == chat_id)
+    async with AsyncSessionLocal() as session:
+        archived_chat_ids = (await session.scalars(stmt)).all()
+    for archived_chat_id in archived_chat_ids:
+        async with AsyncSessionLocal() as session:
+            messages = await load_archived_messages(session, archived_chat_id)
+        yield encode_rows(
+                [(m["chat_id"], m["id"], m["sender"], m["timestamp"], m["content"]) for m in messages],
+                MESSAGE_COLUMNS,
+                fmt,
+            )
+
+
+def export_response(body: AsyncIterator[bytes], fmt: str, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
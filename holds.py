@@ -0,0 +1,148 @@
+import asyncio
+import heapq
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# holds.py
+SEAT_HOLD_SECONDS = int(os.getenv("SEAT_HOLD_SECONDS", "300"))
+# Most seats one user may hold for one performance at a time
+MAX_HELD_SEATS = int(os.getenv("MAX_HELD_SEATS", "10"))
+
+SeatKey = Tuple[int, str]
+UserKey = Tuple[int, int]
+
+
+class HoldLimitError(Exception):
+    """The hold would take the user past MAX_HELD_SEATS for the performance"""
+
+    def __init__(self, held: int, limit: int):
+        super().__init__(f"{held} seats already held, at most {limit} allowed")
+        self.held = held
+        self.limit = limit
+
+
+class SeatHoldManager:
+    """In-process, short-lived seat reservations.
+
+    Holds live in a dict keyed by (performance_id, seat_code) and their
+    expiry times in one min-heap. A single background task sleeps until the
+    earliest expiry and is woken early when a sooner hold is added; no
+    per-hold tasks and no DB polling. Expired heap entries for re-held seats
+    are skipped lazily. Every read also drops anything already expired, so
+    holds are never honoured past their deadline even if the timer lags.
+
+    A user's seats for one performance form a single hold with one deadline,
+    set when the first seat is taken: adding or re-holding seats never moves
+    it, and the hold is capped at `max_seats`.
+    """
+
+    def __init__(self, ttl_seconds: int = SEAT_HOLD_SECONDS, max_seats: int = MAX_HELD_SEATS):
+        self.ttl_seconds = ttl_seconds
+        self.max_seats = max_seats
+        self._holds: Dict[SeatKey, Tuple[int, float]] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._held_per_performance: Dict[int, int] = defaultdict(int)
+        # (performance_id, user_id) -> (seats held, shared deadline)
+        self._user_holds: Dict[UserKey, Tuple[int, float]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._expire_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _expire_loop(self):
+        while True:
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._expire(time.monotonic())
+
+    def _expire(self, now: float):
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, performance_id, seat_code = heapq.heappop(self._heap)
+            key = (performance_id, seat_code)
+            hold = self._holds.get(key)
+            # Only drop the hold if this heap entry is its current deadline
+            if hold is not None and hold[1] == expires_at:
+                self._remove(key)
+
+    def _remove(self, key: SeatKey):
+        user_id, _ = self._holds.pop(key)
+        self._held_per_performance[key[0]] -= 1
+        if not self._held_per_performance[key[0]]:
+            del self._held_per_performance[key[0]]
+        user_key = (key[0], user_id)
+        count, expires_at = self._user_holds[user_key]
+        if count > 1:
+            self._user_holds[user_key] = (count - 1, expires_at)
+        else:
+            del self._user_holds[user_key]
+
+    def holder(self, performance_id: int, seat_code: str) -> Optional[int]:
+        """User id holding the seat, or None"""
+        self._expire(time.monotonic())
+        hold = self._holds.get((performance_id, seat_code))
+        return hold[0] if hold else None
+
+    def held_count(self, performance_id: int) -> int:
+        self._expire(time.monotonic())
+        return self._held_per_performance.get(performance_id, 0)
+
+    def hold(self, performance_id: int, seat_codes: Iterable[str], user_id: int) -> Tuple[List[str], float]:
+        """Holds all seats for the user or none of them.
+
+        Returns (seats held by other users, expiry as a wall-clock timestamp).
+        New seats join the user's existing hold on the performance and expire
+        with it. Raises HoldLimitError if the hold would exceed `max_seats`.
+        """
+        now = time.monotonic()
+        self._expire(now)
+        seat_codes = list(dict.fromkeys(seat_codes))
+        conflicts = [
+            seat for seat in seat_codes
+            if self._holds.get((performance_id, seat), (user_id,))[0] != user_id
+        ]
+        user_key = (performance_id, user_id)
+        held, expires_at = self._user_holds.get(user_key, (0, now + self.ttl_seconds))
+        if conflicts:
+            return conflicts, time.time() + (expires_at - now)
+        new_seats = [seat for seat in seat_codes if (performance_id, seat) not in self._holds]
+        if held + len(new_seats) > self.max_seats:
+            raise HoldLimitError(held, self.max_seats)
+
+        wake = not self._heap or expires_at < self._heap[0][0]
+        for seat in new_seats:
+            self._holds[(performance_id, seat)] = (user_id, expires_at)
+            heapq.heappush(self._heap, (expires_at, performance_id, seat))
+        if new_seats:
+            self._held_per_performance[performance_id] += len(new_seats)
+            self._user_holds[user_key] = (held + len(new_seats), expires_at)
+        if wake and new_seats and self._wakeup is not None:
+            self._wakeup.set()
+        return [], time.time() + (expires_at - now)
+
+    def release(self, performance_id: int, seat_code: str, user_id: Optional[int] = None):
+        key = (performance_id, seat_code)
+        hold = self._holds.get(key)
+        if hold is not None and (user_id is None or hold[0] == user_id):
+            # Its heap entry becomes stale and is skipped when it comes due
+            self._remove(key)
+
+
+seat_holds = SeatHoldManager()
@@ -0,0 +1,184 @@
+import hashlib
+import os
+import zlib
+from functools import lru_cache
+from typing import Iterable
+from urllib.parse import parse_qs
+
+from fastapi import Request, Response
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# http_cache.py
+API_CACHE_CONTROL = "private, no-cache"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "text/html",
+    "text/css",
+    "text/csv",
+    "text/plain",
+    "image/svg+xml",
+}
+
+
+# --- ETags -----------------------------------------------------------------
+
+def make_etag(*parts) -> str:
+    """Weak ETag from cheap version markers (ids, counters, timestamps)"""
+    digest = hashlib.blake2s("|".join(map(str, parts)).encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # Weak comparison, as required for If-None-Match
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": API_CACHE_CONTROL})
+
+
+def with_etag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = API_CACHE_CONTROL
+    return response
+
+
+# --- Compression -------------------------------------------------------------
+
+def accepts_gzip(headers: Headers) -> bool:
+    for coding in headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class CompressionMiddleware:
+    """Gzips JSON/HTML/text responses of at least `minimum_size` bytes.
+
+    Unlike Starlette's GZipMiddleware it only touches compressible media
+    types (images and other binary files are left alone), and it also
+    compresses streamed bodies chunk by chunk with a sync flush, so NDJSON/CSV
+    exports still arrive incrementally.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, compresslevel: int = 6,
+                 media_types: Iterable[str] = COMPRESSIBLE_TYPES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.media_types = set(media_types)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not accepts_gzip(Headers(scope=scope)):
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message = {}
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+                if (
+                    media_type not in self.media_types
+                    or "content-encoding" in headers
+                    or start_message["status"] in (204, 304)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                headers["Content-Encoding"] = "gzip"
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = compressor.compress(body) + compressor.flush()
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+
+            if more_body:
+                body = compressor.compress(body) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            else:
+                body = compressor.compress(body) + compressor.flush()
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+# --- Static files --------------------------------------------------------------
+
+STATIC_DIRECTORY = "static"
+
+
+@lru_cache(maxsize=1024)
+def _fingerprint(full_path: str, mtime_ns: int, size: int) -> str:
+    digest = hashlib.blake2s(digest_size=6)
+    with open(full_path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def static_fingerprint(path: str, directory: str = STATIC_DIRECTORY) -> str:
+    full_path = os.path.join(directory, path)
+    stat = os.stat(full_path)
+    return _fingerprint(full_path, stat.st_mtime_ns, stat.st_size)
+
+
+def static_url(path: str) -> str:
+    """Fingerprinted URL for templates: /static/<path>?v=<content hash>.
+    Only URLs built here get the immutable Cache-Control."""
+    path = path.lstrip("/")
+    try:
+        return f"/static/{path}?v={static_fingerprint(path)}"
+    except OSError:
+        return f"/static/{path}"
+
+
+class CachedStaticFiles(StaticFiles):
+    """Static files that are immutable when requested with their current
+    fingerprint (see static_url) and revalidated via ETag otherwise."""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            version = parse_qs(scope.get("query_string", b"").decode()).get("v")
+            try:
+                fresh = version == [static_fingerprint(path, str(self.directory))]
+            except OSError:
+                fresh = False
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if fresh else REVALIDATE_CACHE_CONTROL
+        return response
@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from typing import Any, Dict, Optional
+
+from openai import (APIConnectionError, APIStatusError,
+                    APITimeoutError, AsyncOpenAI, RateLimitError)
+
+# llm.py
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+
+class LLMUnavailableError(Exception):
+    """Raised when a completion cannot be obtained from the provider"""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """Raised without calling the provider while the breaker is open"""
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (RateLimitError, APIConnectionError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and lets a single
+    probe through once `cooldown` seconds have passed."""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class LLMMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+        self.call_time_total = 0.0
+
+    def record_queue_time(self, seconds: float):
+        self.queue_time_total += seconds
+        self.queue_time_max = max(self.queue_time_max, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        started = max(self.calls - self.coalesced - self.rejected, 1)
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "queue_time_avg_ms": round(self.queue_time_total / started * 1000, 2),
+            "queue_time_max_ms": round(self.queue_time_max * 1000, 2),
+            "call_time_avg_ms": round(self.call_time_total / started * 1000, 2),
+        }
+
+
+class LLMScheduler:
+    """Single entry point for chat completions.
+
+    Bounds concurrency with a semaphore, applies a deadline to every call
+    (queue time included), retries 429/5xx/network errors with full-jitter
+    backoff, fails fast through a circuit breaker and coalesces identical
+    requests that are already in flight.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_CALL_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.client = client
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN)
+        self.metrics = LLMMetrics()
+        self._max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        return self._semaphore
+
+    @staticmethod
+    def request_key(kwargs: Dict[str, Any]) -> str:
+        payload = json.dumps(kwargs, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def complete(self, timeout: Optional[float] = None, coalesce: bool = True, **kwargs):
+        """Runs `chat.completions.create(**kwargs)` under the scheduler's policies"""
+        self.metrics.calls += 1
+        if not coalesce:
+            return await self._run(timeout or self.timeout, kwargs)
+
+        key = self.request_key(kwargs)
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.metrics.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            result = await self._run(timeout or self.timeout, kwargs)
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else LLMUnavailableError("Request cancelled"))
+            # Mark retrieved so an un-awaited future does not log a warning
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._pending.pop(key, None)
+
+    async def _run(self, timeout: float, kwargs: Dict[str, Any]):
+        # Anything let through while the breaker is not closed is its probe
+        probe = self.breaker.state != "closed"
+        if not self.breaker.allow():
+            self.metrics.rejected += 1
+            raise CircuitOpenError("LLM provider is unavailable, circuit is open")
+        try:
+            return await self._run_allowed(timeout, kwargs)
+        finally:
+            # A cancelled or non-provider failure must not keep the probe slot
+            if probe:
+                self.breaker.probing = False
+
+    async def _run_allowed(self, timeout: float, kwargs: Dict[str, Any]):
+        deadline = time.monotonic() + timeout
+        queued_at = time.monotonic()
+        self.metrics.queued += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.metrics.timeouts += 1
+            raise LLMUnavailableError(f"Timed out after {timeout}s waiting for a free LLM slot")
+        finally:
+            self.metrics.queued -= 1
+
+        self.metrics.record_queue_time(time.monotonic() - queued_at)
+        self.metrics.in_flight += 1
+        started_at = time.monotonic()
+        try:
+            result = await self._call_with_retries(deadline, kwargs)
+        except Exception as e:
+            self.metrics.failures += 1
+            # Only provider-side trouble counts; a bad request is the caller's problem
+            if isinstance(e, LLMUnavailableError) or is_retryable(e):
+                self.breaker.record_failure()
+            raise
+        finally:
+            self.metrics.in_flight -= 1
+            self.metrics.call_time_total += time.monotonic() - started_at
+            self.semaphore.release()
+
+        self.breaker.record_success()
+        return result
+
+    async def _call_with_retries(self, deadline: float, kwargs: Dict[str, Any]):
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.metrics.timeouts += 1
+                raise LLMUnavailableError("LLM call deadline exceeded")
+            try:
+                return await asyncio.wait_for(
+                    self.client.chat.completions.create(timeout=remaining, **kwargs),
+                    remaining,
+                )
+            except (asyncio.TimeoutError, APITimeoutError) as e:
+                self.metrics.timeouts += 1
+                raise LLMUnavailableError("LLM call deadline exceeded") from e
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    raise LLMUnavailableError(f"LLM provider failed after {attempt + 1} attempts: {e}") from e
+                attempt += 1
+                self.metrics.retries += 1
+                print(f"LLM call failed ({e}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
@@ -1,33 +1,58 @@
-import json
-from typing import List, Optional
+import hashlib
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
 
 import uvicorn
 
 from fastapi import (FastAPI, Depends, Request,
                      Form, status, Response,
-                     HTTPException, WebSocket, WebSocketDisconnect, Query)
+                     HTTPException, WebSocket, WebSocketDisconnect, Query, Header)
 from fastapi.responses import RedirectResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
 
-from sqlalchemy import select
+from sqlalchemy import select, func, Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from DB.database import get_db
 from DB.models import User, Message, Chat
+from DB.search import search_messages
+from DB.archive import (load_chat_messages, load_archived_payload, rehydrate_chat,
+                        ARCHIVE_REHYDRATE_ON_READ)
+from DB.chats import add_message, delete_chats, delete_messages, list_user_chats
 from services import (get_current_user_http, get_current_user_from_token, get_token_from_request,
-                      create_access_token, hash_password, verify_password, ConnectionManager)
-from schemas import ChatResponse, MessageResponse, MessageCreate
-from ai import client, get_tools_configs, get_system_prompt, handle_tool_calls
+                      create_access_token, hash_password, verify_password, ConnectionManager,
+                      IdempotencyStore, IdempotencyConflictError)
+from schemas import (ChatResponse, MessageResponse, MessageCreate, MessageBulkDelete,
+                     SearchHit, SearchPage)
+from serializers import encode_messages, json_response, new_message_frame
+from http_cache import (CompressionMiddleware, CachedStaticFiles, static_url,
+                        make_etag, etag_matches, not_modified, with_etag)
+from exports import export_response, stream_messages, stream_rows, user_bookings_query, BOOKING_COLUMNS, BOOKING_KEYSET
+from ai import llm, router, get_tools_configs, get_system_prompt, handle_tool_calls
+from llm import LLMUnavailableError
+from holds import seat_holds
 
 #main.py
-OPENAI_MODEL = "gpt-4.1-mini"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # Token for 24 hours
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+BULK_DELETE_MAX_IDS = 1000
 manager = ConnectionManager()
+idempotency_store = IdempotencyStore()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One timer task expires every seat hold, see holds.py
+    seat_holds.start()
+    yield
+    await seat_holds.stop()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
 templates = Jinja2Templates(directory="templates")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# For {{ static_url("css/app.css") }} in templates. None of them load local
+# assets yet (static/images are readme screenshots), so nothing is immutable today.
+templates.env.globals["static_url"] = static_url
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
@@ -106,20 +131,14 @@ async def index(
     if current_user is None:
         return RedirectResponse(url="/login", status_code=status.HTTP_303_SEE_OTHER)
 
-    result = await db.execute(
-        select(Chat).where(Chat.user_id == current_user.id).order_by(Chat.created_at.desc())
-    )
-    chats = result.scalars().all()
+    chats = await list_user_chats(db, current_user.id)
 
     active_chat: Optional[Chat] = None
-    messages: List[Message] = []
+    messages: List[Row] = []
 
     if chats:
         active_chat = chats[0]
-        result = await db.execute(
-            select(Message).where(Message.chat_id == active_chat.id).order_by(Message.timestamp)
-        )
-        messages = result.scalars().all()
+        messages = await load_chat_messages(db, active_chat)
 
     return templates.TemplateResponse("index.html", {
         "request": request,
@@ -141,10 +160,30 @@ async def create_chat(
     db.add(new_chat)
     await db.commit()
     await db.refresh(new_chat)
-    return ChatResponse.from_orm(new_chat)
+    return ChatResponse.from_db(new_chat)
+
+@app.get("/api/chats", response_model=List[ChatResponse])
+async def list_chats(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_http)
+):
+    version = (await db.execute(
+        select(func.count(Chat.id), func.max(Chat.id), func.max(Chat.last_message_at), func.sum(Chat.message_count))
+        .where(Chat.user_id == current_user.id)
+    )).one()
+    etag = make_etag("chats", current_user.id, *version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    chats = await list_user_chats(db, current_user.id)
+    with_etag(response, etag)
+    return [ChatResponse.from_db(c) for c in chats]
 
 @app.get("/api/chats/{chat_id}/messages", response_model=List[MessageResponse])
 async def get_chat_messages(
+    request: Request,
     chat_id: int,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user_http)
@@ -158,36 +197,38 @@ async def get_chat_messages(
     if not chat:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found or not authorized")
 
-    result = await db.execute(
-        select(Message).where(Message.chat_id == chat_id).order_by(Message.timestamp)
-    )
-    messages = result.scalars().all()
-    return [MessageResponse.from_orm(m) for m in messages]
-
-@app.post("/api/chats/{chat_id}/messages", response_model=MessageResponse)
-async def send_message_to_ai(
-    chat_id: int,
-    message_data: MessageCreate,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user_http)
-):
-    # 1. Auth & chat validation
-    if not current_user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    chat = await db.scalar(select(Chat).where(Chat.id == chat_id, Chat.user_id == current_user.id))
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
+    # The chat summary changes with every insert/delete, so it versions the list
+    etag = make_etag("messages", chat.id, chat.message_count, chat.last_message_at, chat.archived_at)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    if chat.archived_at is not None and not ARCHIVE_REHYDRATE_ON_READ:
+        # Archived payloads are stored as the JSON this endpoint returns
+        return with_etag(json_response(await load_archived_payload(db, chat_id)), etag)
+
+    rows = await load_chat_messages(db, chat)
+    return with_etag(json_response(encode_messages(rows)), etag)
+
+async def process_user_message(
+    chat: Chat,
+    content: str,
+    db: AsyncSession,
+    current_user: User
+) -> MessageResponse:
+    chat_id = chat.id
+    if chat.archived_at is not None:
+        # New activity brings an archived chat back into the hot table
+        await rehydrate_chat(db, chat_id)
 
     # 2. Save user message
-    user_message = Message(
-        chat_id=chat_id,
-        sender=current_user.username,
-        content=message_data.content
-    )
-    db.add(user_message)
+    await add_message(db, chat_id, current_user.username, content)
     await db.commit()
 
+    # A chat archived while this message was being saved is brought back too
+    if await db.scalar(select(Chat.archived_at).where(Chat.id == chat_id)) is not None:
+        await rehydrate_chat(db, chat_id)
+        await db.commit()
+
     # 3. Get chat history (last 10 messages)
     messages = await db.scalars(
     select(Message)
@@ -208,11 +249,10 @@ async def send_message_to_ai(
 
     # 5. Get AI response
     try:
-        response = await client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=openai_messages,
-        tools=get_tools_configs(),
-        tool_choice="auto"
+        response = await router.route(
+            messages=openai_messages,
+            tools=get_tools_configs(),
+            tool_choice="auto"
         )
     
         response_message = response.choices[0].message
@@ -224,33 +264,61 @@ async def send_message_to_ai(
             await handle_tool_calls(tool_calls, openai_messages, db, current_user)
             
             # Second API call with tool responses
-            second_response = await client.chat.completions.create(
-                model=OPENAI_MODEL,
+            second_response = await router.phrase(
                 messages=openai_messages,
+                tool_names=[tool_call.function.name for tool_call in tool_calls],
             )
             ai_content = second_response.choices[0].message.content
         else:
             ai_content = response_message.content
+    except LLMUnavailableError as e:
+        print(f"OpenAI unavailable: {e}")
+        ai_content = "The assistant is temporarily unavailable. Please try again in a moment."
     except Exception as e:
         print(f"OpenAI error: {e}")
         ai_content = "Error processing request" 
 
     # 6. Save & send AI response
-    ai_message = Message(chat_id=chat_id, sender="AI", content=ai_content)
-    db.add(ai_message)
+    ai_message = await add_message(db, chat_id, "AI", ai_content)
     await db.commit()
 
-    await manager.send_message_to_chat(
-        chat_id,
-        json.dumps({
-            "type": "new_message",
-            "message": MessageResponse.from_orm(ai_message).dict()
-        }, default=str)
-    )
+    await manager.send_message_to_chat(chat_id, new_message_frame(ai_message))
 
-    return MessageResponse.from_orm(ai_message)
+    return MessageResponse.from_db(ai_message)
+
+@app.post("/api/chats/{chat_id}/messages", response_model=MessageResponse)
+async def send_message_to_ai(
+    chat_id: int,
+    message_data: MessageCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_http)
+):
+    # 1. Auth & chat validation
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    chat = await db.scalar(select(Chat).where(Chat.id == chat_id, Chat.user_id == current_user.id))
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    if not idempotency_key:
+        return await process_user_message(chat, message_data.content, db, current_user)
+
+    if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+
+    # Retries with the same key wait for / reuse the first result instead of
+    # storing the message again and re-running the LLM and its tools
+    try:
+        return await idempotency_store.run(
+            (current_user.id, chat_id, idempotency_key),
+            hashlib.sha256(message_data.content.encode()).hexdigest(),
+            lambda: process_user_message(chat, message_data.content, db, current_user),
+        )
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
- 
 
 @app.get("/chat/{chat_id}", response_class=HTMLResponse)
 async def get_specific_chat(
@@ -262,13 +330,10 @@ async def get_specific_chat(
     if not current_user:
         return RedirectResponse(url="/login", status_code=status.HTTP_303_SEE_OTHER)
 
-    result_chats = await db.execute(
-        select(Chat).where(Chat.user_id == current_user.id).order_by(Chat.created_at.desc())
-    )
-    chats = result_chats.scalars().all()
+    chats = await list_user_chats(db, current_user.id)
 
     active_chat: Optional[Chat] = None
-    messages: List[Message] = []
+    messages: List[Row] = []
 
     requested_chat_result = await db.execute(
         select(Chat).where(Chat.id == chat_id, Chat.user_id == current_user.id)
@@ -277,10 +342,7 @@ async def get_specific_chat(
 
     if requested_chat:
         active_chat = requested_chat
-        result_messages = await db.execute(
-            select(Message).where(Message.chat_id == active_chat.id).order_by(Message.timestamp)
-        )
-        messages = result_messages.scalars().all()
+        messages = await load_chat_messages(db, active_chat)
     else:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found or not authorized")
 
@@ -301,19 +363,31 @@ async def delete_chat(
     if not current_user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
 
-    chat_to_delete_result = await db.execute(select(Chat).where(Chat.id == chat_id, Chat.user_id == current_user.id))
-    chat_to_delete = chat_to_delete_result.scalar_one_or_none()
-
-    if not chat_to_delete:
+    deleted_ids = await delete_chats(db, current_user.id, [chat_id])
+    if not deleted_ids:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found or not authorized")
-
-    await db.delete(chat_to_delete)
     await db.commit()
 
     manager.disconnect(chat_id)
 
     return {"message": "Chat deleted successfully"} 
 
+@app.delete("/api/chats")
+async def delete_all_chats(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_http)
+):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+
+    deleted_ids = await delete_chats(db, current_user.id)
+    await db.commit()
+
+    for chat_id in deleted_ids:
+        manager.disconnect(chat_id)
+
+    return {"message": "Chats deleted successfully", "deleted": len(deleted_ids)}
+
 
 @app.delete("/api/messages/{message_id}")
 async def delete_message(
@@ -324,29 +398,83 @@ async def delete_message(
     if not current_user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
 
-    message_to_delete_result = await db.execute(
-        select(Message).where(Message.id == message_id)
-    )
-    message_to_delete = message_to_delete_result.scalar_one_or_none()
-
-    if not message_to_delete:
+    # Ownership and sender are checked by the DELETE itself
+    deleted = await delete_messages(db, current_user.id, current_user.username, [message_id])
+    if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
+    await db.commit()
 
-    chat_check_result = await db.execute(
-        select(Chat).where(Chat.id == message_to_delete.chat_id, Chat.user_id == current_user.id)
-    )
-    chat_owner = chat_check_result.scalar_one_or_none()
+    return {"message": "Message deleted successfully"} 
 
-    if not chat_owner:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this message")
-    
-    if message_to_delete.sender != current_user.username and message_to_delete.sender != "AI":
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only owner or AI messages can be deleted.")
+@app.post("/api/messages/bulk-delete")
+async def bulk_delete_messages(
+    data: MessageBulkDelete,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_http)
+):
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+
+    if len(data.message_ids) > BULK_DELETE_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_DELETE_MAX_IDS} messages per request")
 
-    await db.delete(message_to_delete)
+    deleted = await delete_messages(db, current_user.id, current_user.username, data.message_ids)
     await db.commit()
 
-    return {"message": "Message deleted successfully"} 
+    return {"message": "Messages deleted successfully", "deleted": deleted}
+
+@app.get("/api/chats/export")
+async def export_all_chats(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    current_user: User = Depends(get_current_user_http)
+):
+    return export_response(stream_messages(current_user.id, fmt), fmt, "chats")
+
+@app.get("/api/chats/{chat_id}/export")
+async def export_chat(
+    chat_id: int,
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_http)
+):
+    chat = await db.scalar(select(Chat).where(Chat.id == chat_id, Chat.user_id == current_user.id))
+    if not chat:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found or not authorized")
+
+    return export_response(stream_messages(current_user.id, fmt, chat_id), fmt, f"chat-{chat_id}")
+
+@app.get("/api/bookings/export")
+async def export_bookings(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    current_user: User = Depends(get_current_user_http)
+):
+    return export_response(stream_rows(user_bookings_query(current_user.id), BOOKING_COLUMNS, fmt, BOOKING_KEYSET), fmt, "bookings")
+
+@app.get("/api/search", response_model=SearchPage)
+async def search_chat_history(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_http)
+):
+    try:
+        rows, next_cursor = await search_messages(db, current_user.id, q, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return SearchPage(
+        results=[
+            SearchHit(message_id=r.id, chat_id=r.chat_id, sender=r.sender,
+                      timestamp=r.timestamp, snippet=r.snippet, score=r.score)
+            for r in rows
+        ],
+        next_cursor=next_cursor,
+    )
+
+@app.get("/api/llm/metrics")
+async def llm_metrics(current_user: User = Depends(get_current_user_http)):
+    return {**llm.metrics.snapshot(), "circuit": llm.breaker.state, "phases": router.snapshot()}
 
 @app.websocket("/ws/chat/{chat_id}")
 async def websocket_endpoint(
@@ -376,10 +504,10 @@ async def websocket_endpoint(
             await websocket.receive_text()
 
     except WebSocketDisconnect:
-        manager.disconnect(chat_id)
+        manager.disconnect(chat_id, websocket)
     except Exception as e:
         print(f"WebSocket error: {e}") 
-        manager.disconnect(chat_id)
+        manager.disconnect(chat_id, websocket)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=5000)
\ No newline at end of file
@@ -0,0 +1,189 @@
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+from llm import LLMScheduler
+
+# routing.py
+# A small model picks tools and phrases answers; the large one is only used
+# when the small one produces an unusable tool call, or after tools listed
+# in LLM_TOOL_MODELS. Setting every model to the same name restores the
+# single-model behaviour.
+LLM_ESCALATION_MODEL = os.getenv("LLM_ESCALATION_MODEL", "gpt-4.1-mini")
+LLM_ROUTER_MODEL = os.getenv("LLM_ROUTER_MODEL", "gpt-4.1-nano")
+LLM_PHRASING_MODEL = os.getenv("LLM_PHRASING_MODEL", "gpt-4.1-nano")
+# Phrasing model after a given tool, e.g. "book_ticket:gpt-4.1-mini,cancel_booking:gpt-4.1-mini"
+LLM_TOOL_MODELS = os.getenv("LLM_TOOL_MODELS", "")
+
+JSON_TYPES = {
+    "integer": int,
+    "number": (int, float),
+    "string": str,
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+
+def parse_tool_models(value: str) -> Dict[str, str]:
+    models = {}
+    for item in value.split(","):
+        tool, _, model = item.partition(":")
+        if tool.strip() and model.strip():
+            models[tool.strip()] = model.strip()
+    return models
+
+
+def validate_value(value: Any, schema: dict, name: str) -> Optional[str]:
+    expected = schema.get("type")
+    if expected in JSON_TYPES:
+        # bool is a subclass of int, but not a JSON integer
+        if not isinstance(value, JSON_TYPES[expected]) or (expected != "boolean" and isinstance(value, bool)):
+            return f"{name} must be {expected}"
+    if expected == "string" and schema.get("format") == "date":
+        try:
+            date.fromisoformat(value)
+        except ValueError:
+            return f"{name} must be a date in YYYY-MM-DD format"
+    if expected == "array" and "items" in schema:
+        for i, item in enumerate(value):
+            error = validate_value(item, schema["items"], f"{name}[{i}]")
+            if error:
+                return error
+    return None
+
+
+def validate_tool_call(tool_call, tools: Dict[str, dict]) -> Optional[str]:
+    """Checks a tool call against the schemas sent to the model.
+    Returns the first problem found, or None."""
+    name = tool_call.function.name
+    if name not in tools:
+        return f"unknown tool {name!r}"
+    try:
+        arguments = json.loads(tool_call.function.arguments or "{}")
+    except json.JSONDecodeError:
+        return f"{name}: arguments are not valid JSON"
+    if not isinstance(arguments, dict):
+        return f"{name}: arguments must be an object"
+
+    parameters = tools[name].get("parameters", {})
+    properties = parameters.get("properties", {})
+    missing = [key for key in parameters.get("required", []) if key not in arguments]
+    if missing:
+        return f"{name}: missing {', '.join(missing)}"
+    for key, value in arguments.items():
+        if key not in properties:
+            return f"{name}: unexpected argument {key!r}"
+        if value is None and key not in parameters.get("required", []):
+            continue
+        error = validate_value(value, properties[key], f"{name}.{key}")
+        if error:
+            return error
+    return None
+
+
+def validate_tool_calls(tool_calls, tool_configs: Iterable[dict]) -> Optional[str]:
+    tools = {config["function"]["name"]: config["function"] for config in tool_configs}
+    for tool_call in tool_calls or []:
+        error = validate_tool_call(tool_call, tools)
+        if error:
+            return error
+    return None
+
+
+class PhaseMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.escalations = 0
+        self.invalid = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.models: Dict[str, int] = defaultdict(int)
+
+    def record(self, seconds: float):
+        self.calls += 1
+        self.latency_total += seconds
+        self.latency_max = max(self.latency_max, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        calls = max(self.calls, 1)
+        return {
+            "calls": self.calls,
+            "escalations": self.escalations,
+            "escalation_rate": round(self.escalations / calls, 4),
+            "invalid_after_escalation": self.invalid,
+            "latency_avg_ms": round(self.latency_total / calls * 1000, 2),
+            "latency_max_ms": round(self.latency_max * 1000, 2),
+            "models": dict(self.models),
+        }
+
+
+class ModelRouter:
+    """Chooses the model for each phase of a chat turn.
+
+    `route` is the tool-selection completion: it runs on the router model
+    and is retried once on the escalation model if the reply contains a tool
+    call that does not match the tool schemas. `phrase` is the completion
+    that turns tool results into an answer, on the phrasing model unless one
+    of the tools that ran has its own model. Latency is recorded per phase,
+    escalation included.
+    """
+
+    def __init__(
+        self,
+        scheduler: LLMScheduler,
+        router_model: str = LLM_ROUTER_MODEL,
+        phrasing_model: str = LLM_PHRASING_MODEL,
+        escalation_model: str = LLM_ESCALATION_MODEL,
+        tool_models: Optional[Dict[str, str]] = None,
+    ):
+        self.scheduler = scheduler
+        self.router_model = router_model
+        self.phrasing_model = phrasing_model
+        self.escalation_model = escalation_model
+        self.tool_models = parse_tool_models(LLM_TOOL_MODELS) if tool_models is None else tool_models
+        self.metrics = {"routing": PhaseMetrics(), "phrasing": PhaseMetrics()}
+
+    def phrasing_model_for(self, tool_names: Iterable[str]) -> str:
+        for name in tool_names:
+            if name in self.tool_models:
+                return self.tool_models[name]
+        return self.phrasing_model
+
+    async def route(self, messages: List[dict], tools: List[dict], **kwargs):
+        metrics = self.metrics["routing"]
+        started_at = time.monotonic()
+        model = self.router_model
+        try:
+            response = await self.scheduler.complete(model=model, messages=messages, tools=tools, **kwargs)
+            metrics.models[model] += 1
+            error = validate_tool_calls(response.choices[0].message.tool_calls, tools)
+            if error and model != self.escalation_model:
+                print(f"Invalid tool call from {model} ({error}), escalating to {self.escalation_model}")
+                metrics.escalations += 1
+                model = self.escalation_model
+                response = await self.scheduler.complete(model=model, messages=messages, tools=tools, **kwargs)
+                metrics.models[model] += 1
+                error = validate_tool_calls(response.choices[0].message.tool_calls, tools)
+            if error:
+                metrics.invalid += 1
+            return response
+        finally:
+            metrics.record(time.monotonic() - started_at)
+
+    async def phrase(self, messages: List[dict], tool_names: Iterable[str] = (), **kwargs):
+        metrics = self.metrics["phrasing"]
+        started_at = time.monotonic()
+        model = self.phrasing_model_for(tool_names)
+        try:
+            response = await self.scheduler.complete(model=model, messages=messages, **kwargs)
+            metrics.models[model] += 1
+            return response
+        finally:
+            metrics.record(time.monotonic() - started_at)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {phase: metrics.snapshot() for phase, metrics in self.metrics.items()}
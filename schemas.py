@@ -1,25 +1,50 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, VERSION
 from datetime import datetime
+from typing import List, Optional
+
+PYDANTIC_V2 = VERSION.startswith("2.")
+
+class ORMModel(BaseModel):
+    """Response model readable from ORM objects on both pydantic v1 and v2"""
+    if PYDANTIC_V2:
+        model_config = {"from_attributes": True}
+    else:
+        class Config:
+            orm_mode = True
+
+    @classmethod
+    def from_db(cls, obj):
+        return cls.model_validate(obj) if PYDANTIC_V2 else cls.from_orm(obj)
 
 class MessageCreate(BaseModel):
     content: str
 
-class MessageResponse(BaseModel):
+class MessageBulkDelete(BaseModel):
+    message_ids: List[int]
+
+class MessageResponse(ORMModel):
     id: int
     chat_id: int
     sender: str
     content: str
     timestamp: datetime
 
-    class Config:
-        from_attributes = True
-        orm_mode = True
-
-class ChatResponse(BaseModel):
+class ChatResponse(ORMModel):
     id: int
     user_id: int
     created_at: datetime
+    last_message_at: Optional[datetime] = None
+    message_count: int = 0
+    last_message_preview: Optional[str] = None
+
+class SearchHit(BaseModel):
+    message_id: int
+    chat_id: int
+    sender: str
+    timestamp: datetime
+    snippet: str
+    score: float
 
-    class Config:
-        from_attributes = True
-        orm_mode = True
\ No newline at end of file
+class SearchPage(BaseModel):
+    results: List[SearchHit]
+    next_cursor: Optional[str] = None
\ No newline at end of file
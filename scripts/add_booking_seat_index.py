@@ -0,0 +1,62 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import asyncio
+
+from sqlalchemy import select, update, delete, func
+
+from DB.database import engine, add_missing_columns
+from DB.models import Booking
+
+#scripts/add_booking_seat_index.py
+# One-off: adds the unique (performance_id, seat_code) index on bookings to an
+# existing database. Seat codes are upper-cased first, as book_ticket stores them.
+# Existing double bookings are listed and nothing is changed, unless
+#   python scripts/add_booking_seat_index.py --drop-duplicates
+# which keeps the earliest booking of each seat (then run reconcile_occupancy.py).
+class DuplicateBookings(Exception):
+    pass
+
+def migrate(conn, drop_duplicates: bool):
+    normalized = func.upper(func.trim(Booking.seat_code))
+    result = conn.execute(update(Booking).where(Booking.seat_code != normalized).values(seat_code=normalized))
+    if result.rowcount:
+        print(f"Normalized {result.rowcount} seat codes")
+
+    duplicates = conn.execute(
+        select(Booking.performance_id, Booking.seat_code, func.min(Booking.id), func.count(Booking.id))
+        .group_by(Booking.performance_id, Booking.seat_code)
+        .having(func.count(Booking.id) > 1)
+    ).all()
+    for performance_id, seat_code, first_id, count in duplicates:
+        print(f"Performance {performance_id}, seat {seat_code}: {count} bookings (earliest id {first_id})")
+    if duplicates and not drop_duplicates:
+        raise DuplicateBookings(len(duplicates))
+
+    for performance_id, seat_code, first_id, _ in duplicates:
+        conn.execute(
+            delete(Booking).where(
+                Booking.performance_id == performance_id,
+                Booking.seat_code == seat_code,
+                Booking.id != first_id,
+            )
+        )
+    add_missing_columns(conn, Booking.__table__)
+
+async def add_index(drop_duplicates: bool):
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(migrate, drop_duplicates)
+    except DuplicateBookings as e:
+        print(f"❌{e} seats are booked more than once; nothing was changed. "
+              f"Resolve them or rerun with --drop-duplicates.")
+        sys.exit(1)
+    print("✅Unique seat index is in place.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--drop-duplicates", action="store_true",
+                        help="keep only the earliest booking of a double-booked seat")
+    args = parser.parse_args()
+    asyncio.run(add_index(args.drop_duplicates))
@@ -0,0 +1,33 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import asyncio
+
+from DB.database import engine, AsyncSessionLocal, Base, add_missing_columns
+from DB.models import Chat
+from DB.archive import archive_inactive_chats, migrate_message_ids, ARCHIVE_AFTER_DAYS
+
+#scripts/archive_chats.py
+# Moves chats without activity for N days out of the messages table, e.g.:
+#   python scripts/archive_chats.py --days 90
+def prepare_schema(conn):
+    Base.metadata.create_all(conn)
+    add_missing_columns(conn, Chat.__table__)
+    if migrate_message_ids(conn):
+        print("Rebuilt the messages table with AUTOINCREMENT ids")
+
+async def archive(days: int, limit: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(prepare_schema)
+
+    async with AsyncSessionLocal() as session:
+        chats, messages = await archive_inactive_chats(session, days, limit)
+    print(f"✅Archived {chats} chats ({messages} messages) inactive for {days}+ days.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--limit", type=int, default=None, help="archive at most this many chats")
+    args = parser.parse_args()
+    asyncio.run(archive(args.days, args.limit))
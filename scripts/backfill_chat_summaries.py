@@ -0,0 +1,27 @@
+import sys
+import os
+import asyncio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from DB.database import engine, AsyncSessionLocal, add_missing_columns
+from DB.models import Chat, Message
+from DB.chats import refresh_chat_summaries
+
+#scripts/backfill_chat_summaries.py
+# One-off: adds the chat summary columns/indexes to an existing database
+# and fills them from the messages table.
+def add_missing_schema(conn):
+    add_missing_columns(conn, Chat.__table__)
+    add_missing_columns(conn, Message.__table__)
+
+async def backfill():
+    async with engine.begin() as conn:
+        await conn.run_sync(add_missing_schema)
+
+    async with AsyncSessionLocal() as session:
+        await refresh_chat_summaries(session)
+        await session.commit()
+    print("✅Chat summaries have been backfilled.")
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
@@ -0,0 +1,58 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import asyncio
+import json
+import time
+
+from openai import AsyncOpenAI
+
+from llm import LLMScheduler, LLMUnavailableError
+
+#scripts/bench_llm.py
+# Fires concurrent completions through the scheduler against scripts/fake_llm.py
+# and prints the scheduler metrics, e.g.:
+#   FAKE_LLM_ERROR_RATE=0.2 python scripts/fake_llm.py
+#   python scripts/bench_llm.py --requests 200 --concurrency 50
+
+async def run(args):
+    client = AsyncOpenAI(api_key="fake", base_url=args.base_url, max_retries=0)
+    scheduler = LLMScheduler(client, max_concurrency=args.slots, timeout=args.timeout)
+    gate = asyncio.Semaphore(args.concurrency)
+    outcomes = {"ok": 0, "unavailable": 0, "error": 0}
+
+    async def one(i: int):
+        async with gate:
+            try:
+                await scheduler.complete(
+                    model="fake-model",
+                    messages=[{"role": "user", "content": f"request {i % args.distinct}"}],
+                )
+                outcomes["ok"] += 1
+            except LLMUnavailableError:
+                outcomes["unavailable"] += 1
+            except Exception as e:
+                print(f"request {i} failed: {e}")
+                outcomes["error"] += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.monotonic() - started
+
+    print(json.dumps({
+        "elapsed_s": round(elapsed, 2),
+        "outcomes": outcomes,
+        "circuit": scheduler.breaker.state,
+        "metrics": scheduler.metrics.snapshot(),
+    }, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8001/v1")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20, help="client-side concurrent callers")
+    parser.add_argument("--slots", type=int, default=8, help="scheduler concurrency limit")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--distinct", type=int, default=1000, help="distinct prompts; lower values exercise coalescing")
+    asyncio.run(run(parser.parse_args()))
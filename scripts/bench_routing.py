@@ -0,0 +1,94 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import asyncio
+import json
+import time
+
+from openai import AsyncOpenAI
+
+from llm import LLMScheduler, LLMUnavailableError
+from routing import ModelRouter, LLM_ESCALATION_MODEL, LLM_ROUTER_MODEL, LLM_PHRASING_MODEL
+
+#scripts/bench_routing.py
+# Runs whole chat turns (tool selection + phrasing) through the model router
+# against scripts/fake_llm.py and prints per-phase latency and escalations, e.g.:
+#   FAKE_LLM_INVALID_TOOL_RATE=0.1 python scripts/fake_llm.py
+#   python scripts/bench_routing.py --turns 200
+#   python scripts/bench_routing.py --turns 200 --router-model gpt-4.1-mini --phrasing-model gpt-4.1-mini
+TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "list_performances",
+        "description": "Get a list of theater performances by date",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "start_date": {"type": "string", "format": "date"},
+                "end_date": {"type": "string", "format": "date"},
+            },
+        },
+    },
+}]
+PROMPTS = ("What performances are on this week? #{}", "Thanks, that is all #{}")
+
+async def run(args):
+    client = AsyncOpenAI(api_key="fake", base_url=args.base_url, max_retries=0)
+    scheduler = LLMScheduler(client, max_concurrency=args.slots)
+    router = ModelRouter(
+        scheduler,
+        router_model=args.router_model,
+        phrasing_model=args.phrasing_model,
+        escalation_model=args.escalation_model,
+        tool_models={},
+    )
+    gate = asyncio.Semaphore(args.concurrency)
+    outcomes = {"ok": 0, "unavailable": 0, "error": 0}
+    turn_time_total = 0.0
+
+    async def turn(i: int):
+        nonlocal turn_time_total
+        messages = [{"role": "user", "content": PROMPTS[i % len(PROMPTS)].format(i)}]
+        async with gate:
+            started_at = time.monotonic()
+            try:
+                response = await router.route(messages=messages, tools=TOOLS, tool_choice="auto")
+                tool_calls = response.choices[0].message.tool_calls
+                if tool_calls:
+                    messages.append(response.choices[0].message.model_dump(exclude_none=True))
+                    messages += [
+                        {"tool_call_id": call.id, "role": "tool", "name": call.function.name,
+                         "content": "1. Hamlet - 2026-11-01 (sold: 12, held: 0, free: 328)"}
+                        for call in tool_calls
+                    ]
+                    await router.phrase(messages=messages, tool_names=[call.function.name for call in tool_calls])
+                outcomes["ok"] += 1
+            except LLMUnavailableError:
+                outcomes["unavailable"] += 1
+            except Exception as e:
+                print(f"turn {i} failed: {e}")
+                outcomes["error"] += 1
+            turn_time_total += time.monotonic() - started_at
+
+    started = time.monotonic()
+    await asyncio.gather(*(turn(i) for i in range(args.turns)))
+    elapsed = time.monotonic() - started
+
+    print(json.dumps({
+        "elapsed_s": round(elapsed, 2),
+        "turn_time_avg_ms": round(turn_time_total / max(args.turns, 1) * 1000, 2),
+        "outcomes": outcomes,
+        "phases": router.snapshot(),
+    }, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8001/v1")
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20, help="client-side concurrent chat turns")
+    parser.add_argument("--slots", type=int, default=8, help="scheduler concurrency limit")
+    parser.add_argument("--router-model", default=LLM_ROUTER_MODEL)
+    parser.add_argument("--phrasing-model", default=LLM_PHRASING_MODEL)
+    parser.add_argument("--escalation-model", default=LLM_ESCALATION_MODEL)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,98 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from DB.database import Base
+from DB.models import User, Chat, Message
+from schemas import MessageResponse, PYDANTIC_V2
+from serializers import chat_messages_query, encode_messages, new_message_frame
+
+#scripts/bench_serialization.py
+# Compares the old ORM + pydantic + json path with serializers.py on one large chat:
+#   python scripts/bench_serialization.py --messages 10000 --subscribers 5
+
+async def timed(label, fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = await fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<42} {best * 1000:9.2f} ms  {size:>10} bytes")
+    return best
+
+async def run(args):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        db.add(User(id=1, username="bench", email="bench@example.com", hashed_password="-"))
+        db.add(Chat(id=1, user_id=1))
+        await db.commit()
+        started = datetime(2025, 1, 1)
+        await db.execute(insert(Message), [
+            {"chat_id": 1, "sender": "AI" if i % 2 else "bench",
+             "content": f"Message number {i}: " + "lorem ipsum " * 8,
+             "timestamp": started + timedelta(seconds=i)}
+            for i in range(args.messages)
+        ])
+        await db.commit()
+
+    async def old_list():
+        async with AsyncSession(engine) as db:
+            result = await db.execute(select(Message).where(Message.chat_id == 1).order_by(Message.timestamp))
+            models = [MessageResponse.from_db(m) for m in result.scalars().all()]
+            # What FastAPI does with a response_model list
+            return len(json.dumps(jsonable_encoder(models)).encode())
+
+    async def new_list():
+        async with AsyncSession(engine) as db:
+            rows = (await db.execute(chat_messages_query(1))).all()
+            return len(encode_messages(rows))
+
+    message = MessageResponse(id=1, chat_id=1, sender="AI", content="reply " * 40, timestamp=datetime.now())
+
+    dump = message.model_dump if PYDANTIC_V2 else message.dict
+
+    async def old_frames():
+        size = 0
+        for _ in range(args.frames):
+            for _ in range(args.subscribers):
+                size = len(json.dumps({"type": "new_message", "message": dump()}, default=str))
+        return size
+
+    async def new_frames():
+        size = 0
+        for _ in range(args.frames):
+            size = len(new_message_frame(message))
+        return size
+
+    print(f"{args.messages} messages, best of {args.repeat}")
+    old = await timed("list: ORM + MessageResponse + json", old_list, args.repeat)
+    new = await timed("list: columns + orjson", new_list, args.repeat)
+    print(f"{'speedup':<42} {old / new:9.2f}x")
+
+    print(f"\n{args.frames} frames x {args.subscribers} subscribers")
+    old = await timed("ws: json.dumps per subscriber", old_frames, args.repeat)
+    new = await timed("ws: orjson once per chat", new_frames, args.repeat)
+    print(f"{'speedup':<42} {old / new:9.2f}x")
+    await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--frames", type=int, default=1_000)
+    parser.add_argument("--subscribers", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,19 @@
+import sys
+import os
+import asyncio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from DB.database import engine
+from DB.search import rebuild_search_index
+
+#scripts/build_search_index.py
+# Creates the message full-text index on an existing database and
+# reindexes all messages. New databases get it from init_db.py. Rerun it on
+# SQLite databases indexed before messages carried their owner token.
+async def build():
+    async with engine.begin() as conn:
+        await rebuild_search_index(conn)
+    print("✅The message search index has been built.")
+
+if __name__ == "__main__":
+    asyncio.run(build())
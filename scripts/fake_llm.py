@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+#scripts/fake_llm.py
+# Local stand-in for the OpenAI Chat Completions API.
+# Run it and point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8001/v1
+LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "300"))
+JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "100"))
+ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+RATE_LIMIT_RATE = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0"))
+PORT = int(os.getenv("FAKE_LLM_PORT", "8001"))
+# Models whose name contains the marker are "small": faster, and they get
+# INVALID_TOOL_RATE of their tool calls wrong (see routing.py escalation)
+SMALL_MODEL_MARKER = os.getenv("FAKE_LLM_SMALL_MODEL_MARKER", "nano")
+SMALL_LATENCY_MS = float(os.getenv("FAKE_LLM_SMALL_LATENCY_MS", "120"))
+INVALID_TOOL_RATE = float(os.getenv("FAKE_LLM_INVALID_TOOL_RATE", "0"))
+
+SCHEDULE_WORDS = ("performance", "schedule", "show", "афиш", "вистав", "спектак")
+INVALID_TOOL_CALLS = (
+    ("list_performance", json.dumps({})),
+    ("list_performances", '{"start_date": '),
+    ("list_performances", json.dumps({"start_date": 20260101})),
+)
+
+app = FastAPI()
+
+
+def is_small(model: str) -> bool:
+    return bool(SMALL_MODEL_MARKER) and SMALL_MODEL_MARKER in model
+
+
+def completion(model: str, message: dict, finish_reason: str) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def build_reply(body: dict) -> dict:
+    model = body.get("model", "fake")
+    messages = body.get("messages", [])
+    last = messages[-1] if messages else {}
+
+    if last.get("role") == "tool":
+        return completion(model, {"role": "assistant", "content": f"Here is what I found:\n{last.get('content')}"}, "stop")
+
+    text = str(last.get("content") or "")
+    if body.get("tools") and any(word in text.lower() for word in SCHEDULE_WORDS):
+        name, arguments = "list_performances", json.dumps({})
+        if is_small(model) and random.random() < INVALID_TOOL_RATE:
+            name, arguments = random.choice(INVALID_TOOL_CALLS)
+        tool_call = {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": name, "arguments": arguments},
+        }
+        return completion(model, {"role": "assistant", "content": None, "tool_calls": [tool_call]}, "tool_calls")
+
+    return completion(model, {"role": "assistant", "content": f"Echo: {text}"}, "stop")
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    latency = SMALL_LATENCY_MS if is_small(body.get("model", "")) else LATENCY_MS
+    await asyncio.sleep(max(0.0, latency + random.uniform(-JITTER_MS, JITTER_MS)) / 1000)
+
+    roll = random.random()
+    if roll < RATE_LIMIT_RATE:
+        return JSONResponse({"error": {"message": "Rate limit reached", "type": "rate_limit"}}, status_code=429)
+    if roll < RATE_LIMIT_RATE + ERROR_RATE:
+        return JSONResponse({"error": {"message": "Upstream overloaded", "type": "server_error"}}, status_code=503)
+
+    return build_reply(body)
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=PORT)
@@ -6,10 +6,11 @@ import asyncio
 import random
 from datetime import datetime, timedelta
 
-from sqlalchemy import select, and_
+from sqlalchemy import select
 
 from DB.database import AsyncSessionLocal, engine, Base
 from DB.models import User, Performance, Booking
+from DB.occupancy import reconcile_occupancy
 from services import hash_password
 
 #scripts/fill_bd.py
@@ -67,22 +68,20 @@ async def seed_database():
 
         # Bookings
         for perf in performances:
+            # Seats taken for this performance, including bookings not flushed yet
+            taken = set((await session.scalars(
+                select(Booking.seat_code).where(Booking.performance_id == perf.id)
+            )).all())
+
             # We reserve from 1 to 4 random seats for each performance
             for _ in range(random.randint(1, 4)):
                 user = random.choice(users)
                 row, seat_num, seat_code = get_random_seat()
 
                 # Checking if this seat is already taken for this performance
-                exists = await session.scalar(
-                    select(Booking).where(
-                        and_(
-                            Booking.performance_id == perf.id,
-                            Booking.seat_code == seat_code
-                        )
-                    )
-                )
-                if exists:
+                if seat_code in taken:
                     continue # If the space is occupied, skip and try again (although the loop does not guarantee a new space)
+                taken.add(seat_code)
 
                 booking = Booking(
                     user_id=user.id,
@@ -91,6 +90,8 @@ async def seed_database():
                 )
                 session.add(booking)
 
+        await session.flush()
+        await reconcile_occupancy(session)
         await session.commit()
         print("The database has been successfully filled.")
 
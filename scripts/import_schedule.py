@@ -0,0 +1,190 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import asyncio
+import csv
+import json
+import re
+from datetime import date
+from typing import Iterator, Optional, Tuple
+
+from sqlalchemy import select, insert, update, tuple_, func
+
+from DB.database import engine, AsyncSessionLocal, Base, add_missing_columns
+from DB.models import Performance
+
+#scripts/import_schedule.py
+# Streams a box-office schedule export and upserts performances by (date, title):
+#   python scripts/import_schedule.py schedule.csv
+#   python scripts/import_schedule.py schedule.json --batch-size 1000
+# Supported formats: CSV with a header row, JSON array, NDJSON / JSON Lines.
+# Fields: date (YYYY-MM-DD), title, author (optional), actors (optional).
+TITLE_MAX_LENGTH = 200
+READ_CHUNK_SIZE = 64 * 1024
+# A JSON array item that does not parse within this many bytes is treated as malformed
+MAX_ITEM_SIZE = 16 * READ_CHUNK_SIZE
+MAX_REPORTED_ERRORS = 20
+SEPARATORS = re.compile(r"[\s,]*")
+
+class DuplicatePerformances(Exception):
+    pass
+
+def prepare_schema(conn):
+    Base.metadata.create_all(conn)
+    # The unique (date, title) index cannot be added over existing duplicates
+    duplicates = conn.execute(
+        select(Performance.date, Performance.title, func.min(Performance.id), func.count(Performance.id))
+        .group_by(Performance.date, Performance.title)
+        .having(func.count(Performance.id) > 1)
+    ).all()
+    for performance_date, title, first_id, count in duplicates:
+        print(f"{performance_date} {title}: {count} performances (earliest id {first_id})")
+    if duplicates:
+        raise DuplicatePerformances(len(duplicates))
+    add_missing_columns(conn, Performance.__table__)
+
+def iter_ndjson(path: str) -> Iterator[Tuple[int, object]]:
+    with open(path, encoding="utf-8-sig") as f:
+        for line_number, line in enumerate(f, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, ValueError(f"invalid JSON: {e.msg}")
+
+def iter_json_array(path: str) -> Iterator[Tuple[int, object]]:
+    """Yields the items of a top-level JSON array without loading the whole file.
+
+    The array cannot be resynchronised after a syntax error, so a malformed
+    item is yielded as an error and ends the iteration.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8-sig") as f:
+        buffer = f.read(READ_CHUNK_SIZE).lstrip()
+        if not buffer.startswith("["):
+            yield 1, ValueError("JSON schedule must be an array of objects")
+            return
+        position = 1
+        index = 0
+        eof = False
+        while True:
+            position = SEPARATORS.match(buffer, position).end()
+            if buffer.startswith("]", position):
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if eof or len(buffer) - position > MAX_ITEM_SIZE:
+                    yield index + 1, ValueError(f"invalid JSON ({e.msg}), rest of the file skipped")
+                    return
+                chunk = f.read(READ_CHUNK_SIZE)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            index += 1
+            yield index, item
+
+def read_rows(path: str) -> Iterator[Tuple[int, object]]:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+    elif extension in (".ndjson", ".jsonl"):
+        yield from iter_ndjson(path)
+    elif extension == ".json":
+        yield from iter_json_array(path)
+    else:
+        raise ValueError(f"Unsupported file type: {extension}")
+
+def validate(row: object) -> Tuple[Optional[dict], Optional[str]]:
+    if isinstance(row, Exception):
+        return None, str(row)
+    if not isinstance(row, dict):
+        return None, "row is not an object"
+
+    title = str(row.get("title") or "").strip()
+    if not title:
+        return None, "missing title"
+    if len(title) > TITLE_MAX_LENGTH:
+        return None, f"title longer than {TITLE_MAX_LENGTH} characters"
+    try:
+        performance_date = date.fromisoformat(str(row.get("date") or "").strip())
+    except ValueError:
+        return None, f"invalid date {row.get('date')!r}, expected YYYY-MM-DD"
+
+    return {
+        "date": performance_date,
+        "title": title,
+        "author": str(row.get("author") or "").strip() or None,
+        "actors": str(row.get("actors") or "").strip() or None,
+    }, None
+
+async def upsert_batch(session, batch: dict, stats: dict):
+    """Upserts one batch keyed by (date, title) in a single transaction"""
+    existing = (await session.execute(
+        select(Performance.id, Performance.date, Performance.title, Performance.author, Performance.actors)
+        .where(tuple_(Performance.date, Performance.title).in_(list(batch)))
+    )).all()
+
+    updates = []
+    for performance_id, performance_date, title, author, actors in existing:
+        row = batch.pop((performance_date, title))
+        if (row["author"], row["actors"]) == (author, actors):
+            stats["unchanged"] += 1
+        else:
+            updates.append({"id": performance_id, "author": row["author"], "actors": row["actors"]})
+
+    if updates:
+        await session.execute(update(Performance), updates)
+    if batch:
+        await session.execute(insert(Performance), list(batch.values()))
+
+    await session.commit()
+    stats["updated"] += len(updates)
+    stats["inserted"] += len(batch)
+
+async def import_schedule(path: str, batch_size: int):
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(prepare_schema)
+    except DuplicatePerformances as e:
+        print(f"❌{e} performances exist more than once with the same date and title; nothing was imported. "
+              f"Merge or delete them first (bookings may point at either copy).")
+        sys.exit(1)
+
+    stats = {"read": 0, "inserted": 0, "updated": 0, "unchanged": 0, "superseded": 0, "rejected": 0}
+    batch: dict = {}
+    async with AsyncSessionLocal() as session:
+        for line_number, row in read_rows(path):
+            stats["read"] += 1
+            values, error = validate(row)
+            if error:
+                stats["rejected"] += 1
+                if stats["rejected"] <= MAX_REPORTED_ERRORS:
+                    print(f"Rejected row {line_number}: {error}")
+                continue
+            # A later row with the same key wins
+            key = (values["date"], values["title"])
+            if key in batch:
+                stats["superseded"] += 1
+            batch[key] = values
+            if len(batch) >= batch_size:
+                await upsert_batch(session, batch, stats)
+                batch = {}
+        if batch:
+            await upsert_batch(session, batch, stats)
+
+    print(f"✅Schedule imported from {stats['read']} rows: {stats['inserted']} inserted, "
+          f"{stats['updated']} updated, {stats['unchanged']} unchanged, "
+          f"{stats['superseded']} superseded by a later row, {stats['rejected']} rejected.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", help="CSV, JSON array or NDJSON file")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(import_schedule(args.path, args.batch_size))
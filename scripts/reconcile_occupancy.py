@@ -0,0 +1,23 @@
+import sys
+import os
+import asyncio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from DB.database import engine, AsyncSessionLocal, add_missing_columns
+from DB.models import Performance
+from DB.occupancy import reconcile_occupancy
+
+#scripts/reconcile_occupancy.py
+# Fixes drift between Performance.seats_sold and the bookings table.
+# Safe to run periodically (e.g. from cron); also adds the column to old databases.
+async def reconcile():
+    async with engine.begin() as conn:
+        await conn.run_sync(add_missing_columns, Performance.__table__)
+
+    async with AsyncSessionLocal() as session:
+        fixed = await reconcile_occupancy(session)
+        await session.commit()
+    print(f"✅Occupancy reconciled, {fixed} performances corrected.")
+
+if __name__ == "__main__":
+    asyncio.run(reconcile())
@@ -0,0 +1,40 @@
+from typing import Iterable, Sequence
+
+import orjson
+from fastapi import Response
+from sqlalchemy import select
+
+from DB.models import Message
+
+# serializers.py
+# Messages are read as plain column tuples and encoded straight to JSON with
+# orjson. Rows come from our own database, so they skip pydantic validation;
+# the output has the same shape as schemas.MessageResponse.
+MESSAGE_COLUMNS = (Message.id, Message.chat_id, Message.sender, Message.content, Message.timestamp)
+MESSAGE_KEYS = tuple(column.key for column in MESSAGE_COLUMNS)
+
+
+def chat_messages_query(chat_id: int):
+    return (
+        select(*MESSAGE_COLUMNS)
+        .where(Message.chat_id == chat_id)
+        .order_by(Message.timestamp, Message.id)
+    )
+
+
+def message_to_dict(message) -> dict:
+    """Works for both ORM objects and selected rows"""
+    return {key: getattr(message, key) for key in MESSAGE_KEYS}
+
+
+def encode_messages(rows: Iterable[Sequence]) -> bytes:
+    return orjson.dumps([dict(zip(MESSAGE_KEYS, row)) for row in rows])
+
+
+def new_message_frame(message) -> str:
+    """WebSocket frame announcing a new message, encoded once for all subscribers"""
+    return orjson.dumps({"type": "new_message", "message": message_to_dict(message)}).decode()
+
+
+def json_response(content: bytes, status_code: int = 200) -> Response:
+    return Response(content=content, status_code=status_code, media_type="application/json")
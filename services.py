@@ -1,7 +1,10 @@
+import asyncio
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict
+from typing import Any, Awaitable, Callable, Optional, Dict, Set, Tuple
 
-from fastapi import Depends, Request, WebSocket, HTTPException, Response
+from fastapi import Depends, Request, WebSocket, WebSocketDisconnect, HTTPException, Response
 from jose import jwt
 from jose.exceptions import ExpiredSignatureError
 from passlib.context import CryptContext
@@ -86,21 +89,89 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[int, WebSocket] = {}
+        self.active_connections: Dict[int, Set[WebSocket]] = {}
 
     async def connect(self, chat_id: int, websocket: WebSocket):
-        if chat_id in self.active_connections:
-            await self.active_connections[chat_id].close()
         await websocket.accept()
-        self.active_connections[chat_id] = websocket
-
-    def disconnect(self, chat_id: int):
-        self.active_connections.pop(chat_id, None)
+        self.active_connections.setdefault(chat_id, set()).add(websocket)
+
+    def disconnect(self, chat_id: int, websocket: Optional[WebSocket] = None):
+        if websocket is None:
+            self.active_connections.pop(chat_id, None)
+            return
+        subscribers = self.active_connections.get(chat_id)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                self.active_connections.pop(chat_id, None)
 
     async def send_message_to_chat(self, chat_id: int, message: str):
-        websocket = self.active_connections.get(chat_id)
-        if websocket:
+        # `message` is already encoded, every subscriber gets the same frame
+        for websocket in list(self.active_connections.get(chat_id, ())):
             try:
                 await websocket.send_text(message)
-            except RuntimeError:
-                self.disconnect(chat_id)
\ No newline at end of file
+            except (RuntimeError, WebSocketDisconnect):
+                self.disconnect(chat_id, websocket)
+
+
+class IdempotencyConflictError(Exception):
+    """Raised when a key is reused for a different request"""
+
+
+class IdempotencyStore:
+    """Bounded TTL store of request results keyed by Idempotency-Key.
+
+    The first request with a key computes the result; duplicates arriving
+    while it is in flight await the same future, later duplicates get the
+    stored result until it expires. Failed computations are forgotten so
+    the client can retry with the same key.
+    """
+
+    def __init__(self, ttl_seconds: float = 24 * 60 * 60, max_entries: int = 10_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[str, float, asyncio.Future]]" = OrderedDict()
+
+    def _evict(self, now: float):
+        # Entries share one TTL, so insertion order is expiry order
+        while self._entries:
+            _, expires_at, _ = next(iter(self._entries.values()))
+            if expires_at > now:
+                break
+            self._entries.popitem(last=False)
+
+        overflow = len(self._entries) - self.max_entries
+        if overflow > 0:
+            # Never drop in-flight entries, duplicates may still be waiting on them
+            done = []
+            for key, (_, _, future) in self._entries.items():
+                if future.done():
+                    done.append(key)
+                    if len(done) == overflow:
+                        break
+            for key in done:
+                del self._entries[key]
+
+    async def run(self, key: Tuple, fingerprint: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        now = time.monotonic()
+        self._evict(now)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_fingerprint, expires_at, future = entry
+            if expires_at > now:
+                if stored_fingerprint != fingerprint:
+                    raise IdempotencyConflictError("Idempotency-Key was already used for a different request")
+                return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._entries[key] = (fingerprint, now + self.ttl_seconds, future)
+        try:
+            result = await compute()
+        except BaseException as e:
+            self._entries.pop(key, None)
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("Request was cancelled"))
+            future.exception()
+            raise
+        future.set_result(result)
+        return result
\ No newline at end of file